@@ -0,0 +1,177 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+
+# Die Einstellungen von translate_files.py werden beim Import aus der Umgebung gelesen,
+# daher werden Cache, Journal und Fehler-Warteschlange vorher auf das Benchmark-Verzeichnis umgebogen.
+BENCH_DIR = tempfile.mkdtemp(prefix="ck3_lotr_bench_")
+os.environ["TRANSLATION_MEMORY_FILE"] = os.path.join(BENCH_DIR, "translation_memory.sqlite")
+os.environ["TRANSLATION_JOURNAL_FILE"] = os.path.join(BENCH_DIR, "translation_journal.jsonl")
+os.environ["FAILURE_QUEUE_FILE"] = os.path.join(BENCH_DIR, "translation_failures.sqlite")
+os.environ["METRICS_REPORT_FILE"] = os.path.join(BENCH_DIR, "translation_run_report.json")
+
+import translate_files
+from paradox_yml import LocDocument
+from translation_backends import StubBackend, set_backend
+from translation_engine import RateLimiter
+
+WORDS = ["the", "king", "of", "Gondor", "Rohan", "realm", "army", "gold", "vassal", "council",
+         "ring", "shadow", "Mordor", "Elves", "Dwarves", "war", "peace", "bloodline", "heir", "crown"]
+# Grenzfälle für den Round-Trip-Check: (Zeile, erwarteter Rohwert, erwarteter Kommentar).
+ROUND_TRIP_CASES = [
+    (' key:0 "Hello" # note "x"\n', 'Hello', ' # note "x"'),
+    (' key:0 "Drücke "X" #bold jetzt#!"\n', 'Drücke "X" #bold jetzt#!', ''),
+    (' key:0 "Er sagte ""Hallo"" # nicht" # "Kommentar"\n', 'Er sagte ""Hallo"" # nicht', ' # "Kommentar"'),
+    (' key:0 "a \\"b\\" # c" # "d"\r\n', 'a \\"b\\" # c', ' # "d"'),
+]
+MARKUP = ["[ROOT.Char.GetShortUIName]", "$VALUE|0$", "#bold", "#!", "@gold_icon!", "[GetTitleByKey('k_gondor').GetName]"]
+
+
+def synthetic_value(rng, markup_ratio):
+    """Erzeugt einen zufälligen, CK3-typischen Lokalisierungstext mit gelegentlichem Markup."""
+    words = [rng.choice(WORDS) for _ in range(rng.randint(1, 24))]
+    if rng.random() < markup_ratio:
+        for _ in range(rng.randint(1, 3)):
+            words.insert(rng.randint(0, len(words)), rng.choice(MARKUP))
+    return " ".join(words).capitalize()
+
+
+def generate_synthetic_tree(folder, files, lines_per_file, duplicate_ratio=0.3, markup_ratio=0.3, seed=0):
+    """
+    Legt einen synthetischen Baum aus `lotr_*_l_german.yml`-Dateien an. Ein Anteil `duplicate_ratio`
+    der Werte wird aus bereits erzeugten Texten wiederverwendet. Gibt die Anzahl der Zeilen zurück.
+    """
+    rng = random.Random(seed)
+    seen_values, total_lines = [], 0
+    for file_index in range(files):
+        subfolder = os.path.join(folder, f"part_{file_index % 10}")
+        os.makedirs(subfolder, exist_ok=True)
+        lines = ["l_german:\n"]
+        for line_index in range(lines_per_file):
+            if seen_values and rng.random() < duplicate_ratio:
+                value = rng.choice(seen_values)
+            else:
+                value = synthetic_value(rng, markup_ratio)
+                seen_values.append(value)
+            lines.append(f' lotr_bench_{file_index}_{line_index}:0 "{value}"\n')
+        with open(os.path.join(subfolder, f"lotr_bench_{file_index}_l_german.yml"), 'w', encoding='utf-8-sig') as f:
+            f.writelines(lines)
+        total_lines += lines_per_file
+    return total_lines
+
+
+def run_benchmark(args):
+    tree = os.path.join(BENCH_DIR, "tree")
+    total_lines = generate_synthetic_tree(tree, args.files, args.lines_per_file, args.duplicate_ratio,
+                                          args.markup_ratio, args.seed)
+    backend = StubBackend(latency=args.latency, failure_rate=args.failure_rate,
+                          malformed_rate=args.malformed_rate, seed=args.seed)
+    set_backend(backend)
+    translate_files.MAX_CONCURRENT_REQUESTS = args.concurrency
+    translate_files.rate_limiter = RateLimiter(args.rpm, args.tpm)
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    start = time.perf_counter()
+    with quiet:
+        translate_files.translate_lotr_files(tree)
+    wall_time = time.perf_counter() - start
+
+    stats = backend.stats()
+    print("--- Benchmark-Ergebnis ---")
+    print(f"Dateien:           {args.files} × {args.lines_per_file} Zeilen = {total_lines} Zeilen")
+    print(f"Gleichzeitig:      {args.concurrency} (RPM {args.rpm or '∞'}, TPM {args.tpm or '∞'})")
+    print(f"Stub:              {args.latency * 1000:.0f} ms Latenz, {args.failure_rate:.0%} Fehler, {args.malformed_rate:.0%} kaputtes JSON")
+    print(f"Laufzeit:          {wall_time:.2f} s")
+    print(f"Durchsatz:         {total_lines / wall_time:.1f} Zeilen/s")
+    print(f"Anfragen:          {stats['requests']}")
+    print(f"Prompt-Tokens:     {stats['prompt_tokens']} ({stats['prompt_tokens'] / total_lines:.1f} pro Zeile)")
+    print(f"Antwort-Tokens:    {stats['response_tokens']}")
+    latency = translate_files.metrics.report()["latency"]
+    for operation in ("api_batch", "api_single_line", "quota_wait", "file_write"):
+        if operation in latency:
+            summary = latency[operation]
+            print(f"{operation + ':':<19}p50 {summary['p50_seconds'] * 1000:.0f} ms, p95 {summary['p95_seconds'] * 1000:.0f} ms, Summe {summary['sum_seconds']:.2f} s")
+    if args.report:
+        translate_files.metrics.write_json(args.report)
+        print(f"Laufbericht:       {args.report}")
+
+
+# Der frühere Zeilen-Regex aus translate_files.py, als Vergleichsbasis für --parse.
+LEGACY_LINE_PATTERN = re.compile(r'^(.*?:\d*\s*)(".*?")(\s*#.*)?$')
+
+
+def legacy_parse(filepath):
+    """Der alte Weg: Datei zeilenweise lesen und jede Zeile mit dem Regex zerlegen."""
+    with open(filepath, 'r', encoding='utf-8-sig') as f:
+        lines = f.readlines()
+    return [match for match in map(LEGACY_LINE_PATTERN.match, lines[1:]) if match]
+
+
+def run_parse_benchmark(args):
+    """Vergleicht den alten Regex-Weg mit dem gemeinsamen Parser auf einem synthetischen Baum."""
+    tree = os.path.join(BENCH_DIR, "tree")
+    total_lines = generate_synthetic_tree(tree, args.files, args.lines_per_file, args.duplicate_ratio,
+                                          args.markup_ratio, args.seed)
+    paths = [os.path.join(root, name) for root, _, names in os.walk(tree) for name in names]
+
+    def measure(parse):
+        best, entries = float("inf"), 0
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            entries = sum(len(parse(path)) for path in paths)
+            best = min(best, time.perf_counter() - start)
+        return best, entries
+
+    legacy_time, legacy_entries = measure(legacy_parse)
+    parser_time, parser_entries = measure(lambda path: LocDocument.load(path).entries)
+    document = LocDocument.load(paths[0])
+    round_trip = "ok" if document.serialize().encode("utf-8") == open(paths[0], 'rb').read() else "FEHLER"
+    for line, value, comment in ROUND_TRIP_CASES:
+        case = LocDocument.parse("l_german:\n" + line)
+        entry = case.entries[0]
+        if (entry.value, entry.comment) != (value, comment) or entry.render(case._line_ending(entry)) != line:
+            round_trip = f"FEHLER bei {line.strip()!r}: Wert {entry.value!r}, Kommentar {entry.comment!r}"
+
+    print("--- Parser-Benchmark (beste von {} Wiederholungen) ---".format(args.repeat))
+    print(f"Dateien:           {len(paths)} mit insgesamt {total_lines} Zeilen")
+    print(f"Regex (alt):       {legacy_time:.3f} s, {legacy_entries} Einträge, {total_lines / legacy_time:,.0f} Zeilen/s")
+    print(f"LocDocument:       {parser_time:.3f} s, {parser_entries} Einträge, {total_lines / parser_time:,.0f} Zeilen/s")
+    print(f"Round-Trip:        {round_trip}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Durchsatz-Benchmark der Übersetzungs-Pipeline mit einem Offline-Stub-Backend.")
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--lines-per-file", type=int, default=200)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.3)
+    parser.add_argument("--markup-ratio", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulierte Latenz pro Anfrage in Sekunden")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rpm", type=int, default=0, help="Anfragen pro Minute (0 = unbegrenzt)")
+    parser.add_argument("--tpm", type=int, default=0, help="Tokens pro Minute (0 = unbegrenzt)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Ausgabe der Pipeline nicht unterdrücken")
+    parser.add_argument("--report", metavar="PFAD", help="JSON-Laufbericht zusätzlich hierhin schreiben (zum Vergleich mehrerer Läufe)")
+    parser.add_argument("--parse", action="store_true", help="Nur das Parsen messen: alter Regex gegen LocDocument")
+    parser.add_argument("--repeat", type=int, default=3, help="Wiederholungen für --parse")
+    args = parser.parse_args()
+    try:
+        if args.parse:
+            run_parse_benchmark(args)
+        else:
+            run_benchmark(args)
+    finally:
+        translate_files.translation_memory.close()
+        shutil.rmtree(BENCH_DIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
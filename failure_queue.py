@@ -0,0 +1,130 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class FailureQueue:
+    """
+    Persistente Warteschlange aller Zeilen, die auch im Einzelmodus nicht übersetzt werden konnten.
+    Ein Eintrag ist über (Datei, Key) eindeutig und hält Zeile, Zielsprache, Quelltext, den letzten
+    Fehlergrund und die Zahl der Versuche. Nach jedem Fehlschlag wächst die Wartezeit bis zum nächsten
+    Versuch exponentiell; nach `max_attempts` Versuchen landet der Eintrag als "dead letter" in der
+    Warteschlange und wird nur noch auf ausdrücklichen Wunsch erneut versucht.
+    """
+
+    def __init__(self, path, max_attempts=5, retry_base_seconds=60, retry_max_seconds=86400, clock=time.time):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._clock = clock
+        self._conn = None
+        self._keys = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # Verbindung erst bei der ersten Nutzung öffnen; die bekannten (Datei, Key)-Paare werden einmal geladen,
+        # damit ein normaler Lauf erfolgreiche Zeilen ohne Datenbankzugriff abhaken kann.
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS failures (
+                    file TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    line INTEGER NOT NULL,
+                    source TEXT NOT NULL,
+                    reason TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    next_attempt_at REAL NOT NULL,
+                    last_failed_at REAL NOT NULL,
+                    PRIMARY KEY (file, key)
+                )""")
+            self._conn.commit()
+            self._keys = set(self._conn.execute("SELECT file, key FROM failures").fetchall())
+        return self._conn
+
+    def _exists(self):
+        return self._conn is not None or os.path.exists(self.path)
+
+    @staticmethod
+    def normalize_path(filepath):
+        return os.path.abspath(filepath)
+
+    def retry_delay(self, attempts):
+        """Wartezeit nach dem `attempts`-ten Fehlschlag: Basis, dann jeweils doppelt so lang, höchstens retry_max_seconds."""
+        return min(self.retry_base_seconds * 2 ** (attempts - 1), self.retry_max_seconds)
+
+    def record_many(self, failures):
+        """
+        Trägt fehlgeschlagene Zeilen ein: eine Liste von {"file", "key", "line", "language", "source", "reason"}.
+        Bereits bekannte Einträge zählen einen weiteren Versuch und übernehmen Zeile, Quelltext und Grund.
+        """
+        if not failures:
+            return
+        now = self._clock()
+        with self._lock:
+            conn = self._connection()
+            for failure in failures:
+                filepath = self.normalize_path(failure["file"])
+                row = conn.execute("SELECT attempts FROM failures WHERE file = ? AND key = ?", (filepath, failure["key"])).fetchone()
+                attempts = (row[0] if row else 0) + 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO failures VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (filepath, failure["key"], failure["language"], failure["line"], failure["source"], failure["reason"],
+                     attempts, now + self.retry_delay(attempts), now),
+                )
+                self._keys.add((filepath, failure["key"]))
+            conn.commit()
+
+    def resolve_many(self, file_keys):
+        """Entfernt (Datei, Key)-Paare, die inzwischen übersetzt sind oder nicht mehr existieren. Gibt die Anzahl zurück."""
+        with self._lock:
+            if not self._exists():
+                # Noch nie etwas fehlgeschlagen: keine leere Datenbank anlegen.
+                return 0
+            self._connection()
+            resolved = [key for key in {(self.normalize_path(filepath), key) for filepath, key in file_keys} if key in self._keys]
+            if not resolved:
+                return 0
+            self._conn.executemany("DELETE FROM failures WHERE file = ? AND key = ?", resolved)
+            self._conn.commit()
+            self._keys.difference_update(resolved)
+            return len(resolved)
+
+    def items(self, due_only=True, include_dead=False):
+        """
+        Gibt die Einträge als Liste von Dictionaries zurück, sortiert nach Datei und Zeile. Standardmäßig nur die,
+        deren Wartezeit abgelaufen ist, und ohne dead letters.
+        """
+        query = "SELECT file, key, language, line, source, reason, attempts, next_attempt_at FROM failures WHERE 1"
+        parameters = []
+        if due_only:
+            query += " AND next_attempt_at <= ?"
+            parameters.append(self._clock())
+        if not include_dead:
+            query += " AND attempts < ?"
+            parameters.append(self.max_attempts)
+        columns = ("file", "key", "language", "line", "source", "reason", "attempts", "next_attempt_at")
+        if not self._exists():
+            return []
+        with self._lock:
+            rows = self._connection().execute(query + " ORDER BY file, line", parameters).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def stats(self):
+        """Gibt {"pending", "dead"} zurück: wartende bzw. aufgegebene Einträge."""
+        if not self._exists():
+            return {"pending": 0, "dead": 0}
+        with self._lock:
+            dead, total = self._connection().execute(
+                "SELECT COALESCE(SUM(attempts >= ?), 0), COUNT(*) FROM failures", (self.max_attempts,)
+            ).fetchone()
+        return {"pending": total - dead, "dead": dead}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
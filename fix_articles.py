@@ -1,20 +1,27 @@
 #C:\Users\atrix\OneDrive\Desktop\english\lotr_titles_l_german.yml
 
 import os
-import time
 import re
-import google.generativeai as genai
+import json
 from dotenv import load_dotenv
+from translation_engine import BatchEngine
+from translation_memory import ArticleLexicon
+from paradox_yml import LocDocument
+from translate_files import generate_content, metrics, write_metrics_report, MAX_CONCURRENT_REQUESTS, TRANSLATION_MEMORY_FILE
 
 load_dotenv()
 
 file_to_fix = os.getenv("FIX_ARTICLES_FILE_PATH")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-flash')
-ERROR_LOG_FILE = "translation_errors.log"
+VALID_ARTICLES = ("der", "die", "das", "den", "dem")
+ARTICLE_BATCH_SIZE = 100
+# Titelstufe vorne und Zusätze hinten werden entfernt, damit z. B. 'k_rohan_article' und 'd_rohan_adj_article' denselben Stamm 'rohan' ergeben.
+TITLE_PREFIX_PATTERN = re.compile(r'^[ekdcbh]_')
+KEY_SUFFIX_PATTERN = re.compile(r'(_adj)?(_article)?$')
 
+article_lexicon = ArticleLexicon(TRANSLATION_MEMORY_FILE)
+
+@metrics.timed("get_correct_article")
 def get_correct_article(phrase, key=""):
     """
     Sendet einen Ausdruck an die KI mit der Aufgabe, den Artikel zu korrigieren.
@@ -67,12 +74,133 @@ def get_correct_article(phrase, key=""):
         """
     
     try:
-        response = model.generate_content(prompt)
-        return response.text.strip() + " "
+        response = generate_content(prompt, "article_single")
+        return response.strip() + " "
     except Exception as e:
         print(f"    - 🛑 Fehler bei der Artikel-Anfrage für '{phrase}': {e}")
         return phrase
 
+def article_lookup(full_key, value_part):
+    """
+    Lexikon-Schlüssel einer Zeile: Reine Platzhalter werden über den Nomen-Stamm aus dem Key aufgelöst,
+    ganze Ausdrücke über den Ausdruck selbst, da dort das folgende Nomen den Artikel bestimmt.
+    """
+    if value_part.strip() == "$the_$":
+        stem = KEY_SUFFIX_PATTERN.sub("", TITLE_PREFIX_PATTERN.sub("", full_key), count=1)
+        return f"stem:{stem}"
+    return f"phrase:{value_part}"
+
+@metrics.timed("resolve_article_batch")
+def resolve_article_batch(items):
+    """
+    Worker für die BatchEngine: bestimmt die Artikel für viele (Lookup, Key, Ausdruck)-Einträge mit einer
+    einzigen JSON-Anfrage. Gibt {Lookup: Artikel} zurück; ungültige Antworten fehlen im Ergebnis.
+    """
+    payload = json.dumps([{"id": str(i), "key": key, "phrase": phrase} for i, (_, key, phrase) in enumerate(items)], ensure_ascii=False)
+    prompt = f"""
+    You are a German grammar expert. The context for the following task is J.R.R. Tolkien's Lord of the Rings.
+    You will receive a JSON array of objects with an `id`, a localization `key` and a `phrase` containing the placeholder "$the_$".
+    For each object, determine the German definite article that replaces "$the_$".
+    If the phrase is only the placeholder, use the `key` (e.g., "k_rohan_article") to infer the noun (e.g., "Rohan").
+    Otherwise the noun following the placeholder in the phrase decides.
+    Each article MUST be exactly one of "der", "die", "das", "den" or "dem".
+    Return ONLY a valid JSON object that maps every `id` to its article, e.g. {{"0": "das", "1": "der"}}.
+    ---
+    JSON array:
+    {payload}
+    """
+    try:
+        response = generate_content(prompt, "article_batch")
+        answers = json.loads(response.strip().removeprefix("```json").removesuffix("```").strip())
+    except Exception as e:
+        print(f"  🛑 Fehler bei der Artikel-Batch-Anfrage: {e}")
+        return {}
+    if not isinstance(answers, dict):
+        return {}
+    resolved = {}
+    for i, (lookup, _, _) in enumerate(items):
+        article = str(answers.get(str(i), "")).strip().lower()
+        if article in VALID_ARTICLES:
+            resolved[lookup] = article
+    return resolved
+
+def resolve_article_single(item):
+    """Worker für den Einzelmodus: fragt einen einzelnen Eintrag mit dem ursprünglichen Prompt ab."""
+    lookup, key, phrase = item
+    if phrase.strip() == "$the_$":
+        answer = get_correct_article(phrase, key)
+    else:
+        answer = get_correct_article(phrase)
+    words = answer.split()
+    article = words[0].lower() if words else ""
+    return {lookup: article} if article in VALID_ARTICLES else {}
+
+def apply_article(value_part, article):
+    """Setzt den Artikel für den Platzhalter ein (wie bisher mit abschließendem Leerzeichen)."""
+    if value_part.strip() == "$the_$":
+        return f"{article} "
+    return value_part.replace("$the_$", article) + " "
+
+def collect_article_entries(document):
+    """Gibt alle Einträge eines Dokuments zurück, deren Wert mit dem '$the_$'-Platzhalter beginnt, jeweils mit Lexikon-Schlüssel."""
+    return [(entry, article_lookup(entry.key, entry.value)) for entry in document.entries if entry.value.startswith("$the_$")]
+
+def fix_articles_in_document(document):
+    """
+    Korrigiert die '$the_$'-Platzhalter eines bereits geladenen Dokuments im Speicher, ohne es zu speichern.
+    Jeder Nomen-Stamm wird nur einmal aufgelöst: zuerst aus dem Lexikon, dann gebündelt per Batch-Anfrage,
+    und nur bei ungültigen Antworten einzeln. Gibt die Anzahl der korrigierten Zeilen zurück.
+    """
+    print(f"Prüfe {len(document.lines)} Zeilen auf '$the_$'-Platzhalter...")
+
+    # Schritt 1: Alle betroffenen Einträge sammeln und nach Lexikon-Schlüssel gruppieren.
+    pending, lookups = collect_article_entries(document), {}
+    for entry, lookup in pending:
+        lookups.setdefault(lookup, (lookup, entry.key, entry.value))
+
+    # Schritt 2: Bekannte Stämme aus dem Lexikon, den Rest gebündelt und parallel bei der KI auflösen.
+    articles = article_lexicon.get_many(lookups)
+    print(f"  📚 {len(pending)} Zeilen, {len(lookups)} verschiedene Stämme/Ausdrücke, {len(articles)} davon bereits im Lexikon.")
+    missing = [item for lookup, item in lookups.items() if lookup not in articles]
+    batches = [missing[start:start + ARTICLE_BATCH_SIZE] for start in range(0, len(missing), ARTICLE_BATCH_SIZE)]
+    engine = BatchEngine(MAX_CONCURRENT_REQUESTS)
+    for batch, resolved in engine.run(batches, resolve_article_batch):
+        metrics.count("article_batches")
+        if len(resolved or {}) < len(batch):
+            metrics.count("article_batches_incomplete")
+        print(f"  - Batch mit {len(batch)} Einträgen: {len(resolved or {})} Artikel bestimmt.")
+        articles.update(resolved or {})
+        article_lexicon.put_many((resolved or {}).items())
+
+    # Schritt 3: Fallback im Einzelmodus für alles, worauf die KI keinen gültigen Artikel geliefert hat.
+    unresolved = [item for item in missing if item[0] not in articles]
+    if unresolved:
+        print(f"  ⚠️ {len(unresolved)} Einträge ohne gültigen Artikel, frage einzeln nach...")
+        metrics.count("article_single_fallbacks", len(unresolved))
+    for (lookup, key, _), resolved in engine.run(unresolved, resolve_article_single):
+        if resolved:
+            articles.update(resolved)
+            article_lexicon.put_many(resolved.items())
+        else:
+            print(f"    - 🛑 Kein gültiger Artikel für '{key}'.")
+            metrics.count("article_failed")
+
+    corrected = 0
+    for entry, lookup in pending:
+        article = articles.get(lookup)
+        if not article:
+            continue
+        value_part = entry.value
+        corrected_value = apply_article(value_part, article)
+        if corrected_value != value_part:
+            # Der Artikel ist fertiger deutscher Text: markieren, damit ihn ein späterer Übersetzungslauf nicht erneut anfasst.
+            document.update_entry(entry, value=f"{corrected_value} ", translated=True)
+            corrected += 1
+            metrics.count("articles_fixed")
+
+            print(f"    -> Zeile {entry.line + 1}: '{value_part}' zu '{corrected_value}' korrigiert.")
+    return corrected
+
 def fix_articles_in_file(filepath):
     """
     Liest eine Datei, findet Zeilen mit dem '$the_$'-Platzhalter,
@@ -84,52 +212,21 @@ def fix_articles_in_file(filepath):
         return
 
     try:
-        with open(filepath, 'r', encoding='utf-8-sig') as f:
-            lines = f.readlines()
-
-        new_lines = list(lines)
-        needs_update = False
-
-        print(f"Prüfe {len(lines)} Zeilen auf '$the_$'-Platzhalter...")
-
-        for i, line in enumerate(lines):
-            if '"$the_$' in line:
-                try:
-                    full_key = line.split(':')[0].strip()
-                    value_part = re.search(r'"(.*?)"', line).group(1)
-                except (AttributeError, IndexError):
-                    continue
-
-                if value_part.strip() == "$the_$":
-                    print(f"  - Analysiere Zeile {i+1} (Key: {full_key})...")
-                    corrected_value = get_correct_article(value_part, full_key)
-                else:
-                    print(f"  - Analysiere Zeile {i+1}...")
-                    corrected_value = get_correct_article(value_part)
-                
-                if corrected_value != value_part:
-                    key_part = line.split('"')[0]
-                    rest_of_line = line.split('"')[-1]
-                    
-                    new_line = f'{key_part}"{corrected_value} "{rest_of_line}'
-                    new_lines[i] = new_line
-                    needs_update = True
-                    
-                    print(f"    -> '{value_part}' zu '{corrected_value}' korrigiert.")
-                
-                time.sleep(1)
-
-        if needs_update:
+        with metrics.timed("file_read"):
+            document = LocDocument.load(filepath)
+        if fix_articles_in_document(document):
             print("💾 Speichere die korrigierte Datei...")
-            with open(filepath, 'w', encoding='utf-8-sig') as f:
-                f.writelines(new_lines)
+            with metrics.timed("file_write"):
+                document.save()
         else:
             print("✅ Keine Korrekturen notwendig.")
 
     except Exception as e:
         print(f"🛑 Ein schwerwiegender Fehler ist aufgetreten: {e}")
 
+    print(f"📚 Artikel-Lexikon: {article_lexicon.hits} Treffer, {article_lexicon.misses} neu aufzulösen.")
     print("\n✨ Artikel-Korrektur abgeschlossen.")
+    write_metrics_report()
 
 
 if __name__ == '__main__':
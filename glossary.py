@@ -0,0 +1,146 @@
+import os
+from collections import deque
+
+
+def is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+class TermMatcher:
+    """
+    Aho-Corasick-Automat über viele Begriffe gleichzeitig. Die Suche läuft in einem Durchgang über den
+    Text, ihre Dauer hängt also nur von der Textlänge (und der Zahl der Treffer) ab – nicht davon,
+    ob das Glossar zehn oder zehntausende Einträge hat. Begriffe und Text werden kleingeschrieben verglichen.
+    """
+
+    def __init__(self, terms):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._lengths = []
+        for term_id, term in enumerate(terms):
+            node = 0
+            for char in term:
+                child = self._goto[node].get(char)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto[node][char] = child
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                node = child
+            self._output[node].append(term_id)
+            self._lengths.append(len(term))
+
+        # Fehlerlinks in Breitensuche setzen; jeder Knoten erbt die Treffer seines Fehlerlinks.
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, text):
+        """Liefert (Start, Ende, Begriffs-Nr.) für jedes Vorkommen eines Begriffs im (kleingeschriebenen) Text."""
+        goto, fail, output, lengths = self._goto, self._fail, self._output, self._lengths
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for term_id in output[node]:
+                yield position + 1 - lengths[term_id], position + 1, term_id
+
+
+class Glossary:
+    """
+    Verbindliche Übersetzungen für Tolkien-Namen und CK3-Begriffe, z. B. 'Frodo Baggins' -> 'Frodo Beutlin'.
+    `find_terms()` sucht die Einträge, die in einem Text vorkommen (ganze Wörter, längster Treffer gewinnt),
+    damit pro Batch nur diese in den Prompt kommen. Einträge mit Großbuchstaben sind Namen und Titel und werden
+    nur in genau dieser Schreibweise gefunden ('Took' ja, das Verb 'took' nicht); kleingeschriebene Einträge
+    passen in jeder Schreibweise, also auch am Satzanfang ('Vassal'). `violations()` prüft danach, ob die
+    Übersetzung den geforderten deutschen Begriff enthält.
+    """
+
+    def __init__(self, entries=()):
+        self.entries = {}
+        for source, target in entries:
+            self.entries[source.lower()] = (source, target)
+        self._terms = list(self.entries)
+        self._case_sensitive = [self.entries[term][0] != term for term in self._terms]
+        self._matcher = TermMatcher(self._terms)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Liest eine Glossar-Datei: eine Zeile pro Eintrag, englischer und deutscher Begriff durch einen
+        Tabulator getrennt. Leere Zeilen und Zeilen mit '#' am Anfang werden ignoriert.
+        Fehlt die Datei, ist das Glossar leer.
+        """
+        if not path or not os.path.exists(path):
+            return cls()
+        entries = []
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                parts = [part.strip() for part in line.split("\t")]
+                if len(parts) < 2 or not parts[0] or not parts[1]:
+                    print(f"  ⚠️ Glossar '{path}', Zeile {line_number}: erwartet 'Englisch<TAB>Deutsch', übersprungen.")
+                    continue
+                entries.append((parts[0], parts[1]))
+        return cls(entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def find_terms(self, text):
+        """Gibt die im Text vorkommenden Einträge als Liste von (Englisch, Deutsch) zurück."""
+        if not self.entries:
+            return []
+        lowered = text.lower()
+        # Nur wenn das Kleinschreiben die Länge nicht ändert, entsprechen die Positionen denen im Originaltext.
+        same_positions = len(lowered) == len(text)
+        matches = []
+        for start, end, term_id in self._matcher.find(lowered):
+            if start > 0 and is_word_char(lowered[start - 1]):
+                continue
+            if end < len(lowered) and is_word_char(lowered[end]):
+                continue
+            if same_positions and self._case_sensitive[term_id] and text[start:end] != self.entries[self._terms[term_id]][0]:
+                continue
+            matches.append((start, -end, term_id))
+        # Von links nach rechts den jeweils längsten Treffer nehmen: 'Frodo Baggins' verdrängt 'Baggins'.
+        found, covered_until = {}, 0
+        for start, negative_end, term_id in sorted(matches):
+            if start < covered_until:
+                continue
+            covered_until = -negative_end
+            term = self._terms[term_id]
+            found[term] = self.entries[term]
+        return list(found.values())
+
+    @staticmethod
+    def target_stems(target):
+        """
+        Wortstämme eines deutschen Begriffs für die Prüfung: Längere Wörter verlieren die letzten zwei Zeichen,
+        damit gebeugte Formen ('dem Einsamen Berg', 'des Auenlandes') den Begriff 'Einsamer Berg' bzw. 'Auenland' erfüllen.
+        """
+        return [word[:max(4, len(word) - 2)] for word in target.lower().split()]
+
+    @classmethod
+    def violations(cls, required_entries, translated_text):
+        """Gibt die Einträge zurück, deren deutscher Begriff in der Übersetzung fehlt (Groß-/Kleinschreibung egal)."""
+        lowered = translated_text.lower()
+        return [(source, target) for source, target in required_entries
+                if not all(stem in lowered for stem in cls.target_stems(target))]
+
+    @staticmethod
+    def format_entries(entries):
+        """Formatiert Einträge für den Prompt, eine Zeile pro Eintrag."""
+        return "\n".join(f"- {source} → {target}" for source, target in entries)
@@ -0,0 +1,45 @@
+import re
+from collections import Counter
+
+# Paradox-Markup, das die KI unverändert lassen muss:
+#   [GetPlayer.GetName]   Spielcode
+#   $the_$ / $VALUE|0$    Variablen
+#   #bold / #high;P / #!  Formatierungsmarker
+#   @gold_icon!           Icons
+MARKUP_PATTERN = re.compile(
+    r"\[[^\[\]\n]*\]"
+    r"|\$[A-Za-z_][\w|=+\-.%]*\$"
+    r"|#(?:!|[A-Za-z_][\w;]*)"
+    r"|@[\w]+!"
+)
+SENTINEL_PATTERN = re.compile(r"\{(\d+)\}")
+
+
+def mask_markup(text):
+    """
+    Ersetzt jedes Paradox-Konstrukt durch einen kompakten Platzhalter `{0}`, `{1}`, ...
+    Gibt (maskierter Text, Liste der ersetzten Originale) zurück. Texte, die bereits
+    geschweifte Klammern enthalten, bleiben unmaskiert, damit nichts verwechselt wird.
+    """
+    if "{" in text or "}" in text:
+        return text, []
+    originals = []
+
+    def replace(match):
+        originals.append(match.group(0))
+        return f"{{{len(originals) - 1}}}"
+
+    return MARKUP_PATTERN.sub(replace, text), originals
+
+
+def unmask_markup(text, originals):
+    """
+    Setzt die Originale wieder ein. Gibt None zurück, wenn nicht jeder Platzhalter
+    genau einmal zurückgekommen ist oder unbekannte Platzhalter auftauchen.
+    """
+    if not originals:
+        return text
+    counts = Counter(int(index) for index in SENTINEL_PATTERN.findall(text))
+    if counts != Counter(range(len(originals))):
+        return None
+    return SENTINEL_PATTERN.sub(lambda match: originals[int(match.group(1))], text)
@@ -0,0 +1,69 @@
+import argparse
+import os
+from dotenv import load_dotenv
+import update_files
+import translate_files
+from translate_files import metrics, translation_memory, write_metrics_report, TARGET_LANGUAGE
+from paradox_yml import LocDocument
+from pipeline import matches_only
+
+load_dotenv()
+
+folder_to_translate = os.getenv("FOLDER_PATH")
+
+# Zielsprachen des mehrsprachigen Modus, so geschrieben wie im Dateinamen und in der Kopfzeile (l_french: ...).
+TARGET_LANGUAGES = [language.strip() for language in os.getenv("TARGET_LANGUAGES", TARGET_LANGUAGE).split(",") if language.strip()]
+
+def load_locale_documents(main_folder, languages, only=None):
+    """
+    Liest jede englische Quelldatei genau einmal und leitet daraus im Speicher die Datei jeder Zielsprache ab.
+    Die englischen Quellen bleiben unangetastet. Gibt {Sprache: {Dateipfad: LocDocument}} zurück.
+    """
+    documents = {language: {} for language in languages}
+    sources = 0
+    for root, _, files in os.walk(main_folder):
+        for filename in files:
+            english_path = os.path.join(root, filename)
+            if not filename.endswith("_english.yml") or not matches_only(english_path, main_folder, only):
+                continue
+            try:
+                with metrics.timed("file_read"):
+                    english_document = LocDocument.load(english_path)
+                    if english_document.language != "english":
+                        continue
+                    for language in languages:
+                        document, _ = update_files.derive_locale_document(english_document, english_path, language)
+                        documents[language][document.path] = document
+                sources += 1
+            except Exception as e:
+                print(f"  🛑 Schwerwiegender Fehler bei Datei {filename}: {e}")
+    print(f"📂 {sources} englische Quelldateien einmal gelesen, daraus {sources * len(languages)} Sprachdateien abgeleitet ({', '.join(languages)}).")
+    return documents
+
+def parse_languages(value):
+    languages = list(dict.fromkeys(language.strip().lower() for language in value.split(",") if language.strip()))
+    if not languages or "english" in languages:
+        raise argparse.ArgumentTypeError("Mindestens eine Zielsprache angeben (nicht english), z. B. german,french")
+    return languages
+
+def main():
+    parser = argparse.ArgumentParser(description="Englische Quellen einmal lesen und in mehrere Sprachen gleichzeitig übersetzen.")
+    parser.add_argument("folder", nargs="?", default=folder_to_translate, help="Hauptordner (Standard: FOLDER_PATH aus der .env)")
+    parser.add_argument("--languages", type=parse_languages, default=TARGET_LANGUAGES,
+                        help="Kommagetrennte Zielsprachen, z. B. german,french,spanish (Standard: TARGET_LANGUAGES aus der .env)")
+    parser.add_argument("--only", metavar="GLOB", help="Nur Quelldateien, deren Name oder relativer Pfad zum Muster passt")
+    args = parser.parse_args()
+    if not args.folder or not os.path.isdir(args.folder):
+        print("🛑 FEHLER: FOLDER_PATH in der .env-Datei ist nicht gesetzt oder kein gültiger Ordner.")
+        return
+    print(f"--- Starte mehrsprachige Übersetzung ({', '.join(args.languages)}) in: '{args.folder}' ---")
+    try:
+        translate_files.translate_documents(load_locale_documents(args.folder, args.languages, args.only))
+        write_metrics_report()
+    finally:
+        translation_memory.close()
+        translate_files.failure_queue.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+import re
+
+from translation_journal import atomic_write_lines
+
+TRANSLATION_MARKER = "#~TR~"
+BOM = "\ufeff"
+HEADER_PATTERN = re.compile(r"^l_(\w+):\s*$")
+# Eine Eintragszeile in einem Durchgang: Präfix (Einrückung, Key, Version), Wert, Kommentar.
+# Der Wert endet zunächst am letzten Anführungszeichen, hinter dem nur noch Leerraum oder ein
+# Kommentar folgt – verdoppelte oder mit Backslash versehene Anführungszeichen im Wert sind so kein Problem.
+ENTRY_PATTERN = re.compile(r'([ \t]*([^\s:"#]+):(\d*)[ \t]*)"(.*)"([ \t]*(?:#[^\r\n]*)?)\r?\n?\Z')
+# Mögliches früheres Wertende: ein Anführungszeichen, hinter dem ein Kommentar beginnt (`"Hello" # note "x"`).
+COMMENT_START_PATTERN = re.compile(r'(?<!\\)"(?=[ \t]*#)')
+
+
+def unescape_value(raw_value):
+    """Wandelt einen Wert aus der Datei in lesbaren Text um (verdoppelte Anführungszeichen -> eines)."""
+    return raw_value.replace('""', '"')
+
+
+def escape_value(text):
+    """Gegenstück zu `unescape_value`: bereitet Text zum Schreiben zwischen Anführungszeichen vor."""
+    return text.replace('"', '""').replace('\n', '\\n')
+
+
+class LocEntry:
+    """
+    Eine Lokalisierungszeile `key:version "value" # Kommentar`.
+    `value` ist der Rohwert wie in der Datei, `comment` alles hinter dem schließenden Anführungszeichen
+    ohne den Übersetzungsmarker, `line` der Zeilenindex im Dokument (Paradox-Einträge sind immer einzeilig).
+    """
+
+    __slots__ = ("key", "version", "value", "comment", "translated", "line", "prefix")
+
+    def __init__(self, key, version, value, comment, translated, line, prefix):
+        self.key = key
+        self.version = version
+        self.value = value
+        self.comment = comment
+        self.translated = translated
+        self.line = line
+        self.prefix = prefix
+
+    @property
+    def text(self):
+        return unescape_value(self.value)
+
+    def render(self, line_ending="\n"):
+        marker = f"  {TRANSLATION_MARKER}" if self.translated else ""
+        return f'{self.prefix.rstrip()} "{self.value}"{self.comment}{marker}{line_ending}'
+
+    def __repr__(self):
+        return f"LocEntry({self.key}:{self.version} {self.value!r})"
+
+
+def split_line_ending(line):
+    if line.endswith("\r\n"):
+        return line[:-2], "\r\n"
+    if line.endswith("\n"):
+        return line[:-1], "\n"
+    return line, ""
+
+
+def balanced_quotes(value):
+    """Prüft, ob ein Rohwert nur paarweise Anführungszeichen enthält (escapte und verdoppelte zählen nicht)."""
+    return value.replace('\\"', '').replace('""', '').count('"') % 2 == 0
+
+
+def split_comment(value, comment):
+    """
+    Enthält ein Kommentar selbst Anführungszeichen, hat der gierige Regex ihn in den Wert gezogen. Der Wert
+    endet dann am ersten Anführungszeichen vor einem '#', sofern der Wert davor keine offenen Anführungszeichen
+    hat – so bleibt z. B. `"Drücke "X" #bold jetzt#!"` ein Wert.
+    """
+    for match in COMMENT_START_PATTERN.finditer(value):
+        head = value[:match.start()]
+        if balanced_quotes(head):
+            return head, value[match.end():] + '"' + comment
+    return value, comment
+
+
+def parse_line(line, line_index):
+    """Zerlegt eine Zeile (mit oder ohne Zeilenende) in einen LocEntry oder gibt None zurück."""
+    match = ENTRY_PATTERN.match(line)
+    if match is None:
+        return None
+    indent_and_key, key, version, value, comment = match.groups()
+    if '"' in value:
+        value, comment = split_comment(value, comment)
+    translated = TRANSLATION_MARKER in comment
+    if translated:
+        comment = comment.replace(f"  {TRANSLATION_MARKER}", "", 1).replace(TRANSLATION_MARKER, "", 1)
+    return LocEntry(key, version, value, comment, translated, line_index, indent_and_key)
+
+
+class LocDocument:
+    """
+    Eine geparste Lokalisierungsdatei. Die Originalzeilen bleiben erhalten, sodass `serialize()` eine
+    unveränderte Datei Byte für Byte (inklusive BOM, Kommentaren und Zeilenenden) zurückgibt; nur
+    geänderte Einträge werden neu geschrieben. `index` ordnet jedem Key seinen (ersten) Eintrag zu,
+    `modified` zeigt an, ob es seit dem Laden oder letzten Speichern Änderungen gibt.
+    """
+
+    def __init__(self, lines, bom=False, path=None):
+        self.path = path
+        self.lines = lines
+        self.bom = bom
+        self.modified = False
+        self.language = None
+        self.header_line = None
+        self.entries = []
+        self.index = {}
+        for i, line in enumerate(lines):
+            if self.language is None and line.lstrip().startswith("l_"):
+                header = HEADER_PATTERN.match(line.strip())
+                if header:
+                    self.language = header.group(1)
+                    self.header_line = i
+                    continue
+            entry = parse_line(line, i)
+            if entry is not None:
+                self.entries.append(entry)
+                self.index.setdefault(entry.key, entry)
+
+    @classmethod
+    def parse(cls, text, path=None):
+        bom = text.startswith(BOM)
+        if bom:
+            text = text[1:]
+        # Nur an "\n" trennen: "\r\n" bleibt so am Zeilenende erhalten, und Sonderzeichen wie
+        # U+2028 im Text erzeugen keine zusätzlichen Zeilen.
+        parts = text.split("\n")
+        lines = [part + "\n" for part in parts[:-1]]
+        if parts[-1]:
+            lines.append(parts[-1])
+        return cls(lines, bom, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            raw = f.read()
+        return cls.parse(raw.decode('utf-8'), path)
+
+    def copy(self, path=None):
+        """
+        Unabhängige Kopie ohne erneutes Parsen, z. B. um aus einer englischen Quelle mehrere Sprachdateien
+        abzuleiten. Zeilen und Einträge werden kopiert, sodass Änderungen an der Kopie das Original nicht berühren.
+        """
+        document = LocDocument.__new__(LocDocument)
+        document.path = path or self.path
+        document.lines = list(self.lines)
+        document.bom = self.bom
+        document.modified = self.modified
+        document.language = self.language
+        document.header_line = self.header_line
+        document.entries = [
+            LocEntry(e.key, e.version, e.value, e.comment, e.translated, e.line, e.prefix) for e in self.entries
+        ]
+        document.index = {}
+        for entry in document.entries:
+            document.index.setdefault(entry.key, entry)
+        return document
+
+    def serialize(self):
+        return (BOM if self.bom else "") + "".join(self.lines)
+
+    def save(self, path=None):
+        """Schreibt das Dokument atomar und immer mit UTF-8-BOM, wie es CK3 erwartet."""
+        self.bom = True
+        atomic_write_lines(path or self.path, [self.serialize()], encoding='utf-8', newline='')
+        self.modified = False
+
+    def _line_ending(self, entry):
+        return split_line_ending(self.lines[entry.line])[1] or ("\n" if entry.line < len(self.lines) - 1 else "")
+
+    def update_entry(self, entry, value=None, translated=None, comment=None):
+        """Setzt Rohwert, Markerstatus und/oder Kommentar eines Eintrags und schreibt seine Zeile neu."""
+        if value is not None:
+            entry.value = value
+        if comment is not None:
+            entry.comment = comment
+        if translated is not None:
+            entry.translated = translated
+        self.lines[entry.line] = entry.render(self._line_ending(entry))
+        self.modified = True
+
+    def set_translation(self, entry, text):
+        """Trägt eine Übersetzung (als Klartext) ein und markiert den Eintrag als übersetzt."""
+        self.update_entry(entry, escape_value(text), True)
+
+    def set_language(self, language):
+        """Ändert die Kopfzeile, z. B. von `l_english:` auf `l_german:`."""
+        if self.header_line is None:
+            self.lines.insert(0, f"l_{language}:\n")
+            self.header_line = 0
+            for entry in self.entries:
+                entry.line += 1
+        else:
+            _, line_ending = split_line_ending(self.lines[self.header_line])
+            self.lines[self.header_line] = f"l_{language}:{line_ending or chr(10)}"
+        self.language = language
+        self.modified = True
+
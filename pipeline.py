@@ -0,0 +1,209 @@
+import argparse
+import fnmatch
+import os
+from dotenv import load_dotenv
+import update_files
+import translate_files
+import fix_articles
+from paradox_yml import LocDocument
+from markup_mask import mask_markup
+from glossary import Glossary
+
+load_dotenv()
+
+folder_to_process = os.getenv("FOLDER_PATH")
+
+STAGES = ("prepare", "translate", "articles")
+# Dateien, in denen die Artikel-Stufe '$the_$' korrigiert. Standard: der Dateiname aus FIX_ARTICLES_FILE_PATH.
+ARTICLE_FILES_GLOB = os.getenv("ARTICLE_FILES_GLOB") or (
+    os.path.basename(fix_articles.file_to_fix) if fix_articles.file_to_fix else "*titles*_german.yml"
+)
+
+def matches_only(filepath, main_folder, pattern):
+    """Prüft eine Datei gegen das --only-Muster (Dateiname oder Pfad relativ zum Hauptordner)."""
+    if not pattern:
+        return True
+    relative_path = os.path.relpath(filepath, main_folder).replace(os.sep, "/")
+    return fnmatch.fnmatch(os.path.basename(filepath), pattern) or fnmatch.fnmatch(relative_path, pattern)
+
+def discover_files(main_folder, only):
+    """Ein einziger Durchgang durch den Baum: gibt die passenden englischen und deutschen Dateien zurück."""
+    english_paths, german_paths = [], []
+    for root, _, files in os.walk(main_folder):
+        for filename in files:
+            filepath = os.path.join(root, filename)
+            if not matches_only(filepath, main_folder, only):
+                continue
+            if filename.endswith("_english.yml"):
+                english_paths.append(filepath)
+            elif filename.endswith("_german.yml"):
+                german_paths.append(filepath)
+    return english_paths, german_paths
+
+def run_prepare_stage(main_folder, english_paths, documents, sync, manifest):
+    """
+    Stufe 1: Englische Quellen in deutsche Dokumente umwandeln – nur im Speicher.
+    Gibt (nach dem Schreiben zu löschende englische Dateien, nach dem Schreiben zu übernehmende Manifest-Einträge) zurück.
+    """
+    sources_to_remove, manifest_updates = {}, {}
+    for english_path in english_paths:
+        german_path = update_files.german_path_for(english_path)
+        if sync:
+            result = update_files.sync_english_file(main_folder, english_path, manifest)
+            if result is None or result[0] is None:
+                continue
+            document, _, manifest_entry = result
+            manifest_updates[german_path] = (os.path.relpath(english_path, main_folder), manifest_entry)
+        else:
+            try:
+                with translate_files.metrics.timed("file_read"):
+                    document = LocDocument.load(english_path)
+            except Exception as e:
+                print(f"Fehler beim Lesen von {english_path}: {e}")
+                continue
+            if not update_files.prepare_document(document):
+                continue
+            document.path = german_path
+            sources_to_remove[german_path] = english_path
+        documents[german_path] = document
+    print(f"🔧 Vorbereitung: {len(sources_to_remove) + len(manifest_updates)} von {len(english_paths)} englischen Dateien umgewandelt.")
+    return sources_to_remove, manifest_updates
+
+def report_translation(documents):
+    """Trockenlauf der Übersetzungs-Stufe: zählt offene Zeilen, ohne eine Anfrage zu senden oder eine Datei anzufassen."""
+    entries = [entry for document in documents.values() for entry in translate_files.collect_entries(document)]
+    texts = {entry.text for entry in entries}
+    cached = translate_files.translation_memory.peek_many(texts, translate_files.TARGET_LANGUAGE)
+    # Wie im echten Lauf zählen nur Treffer, die zum aktuellen Glossar passen.
+    usable = [text for text, translation in cached.items()
+              if not Glossary.violations(translate_files.glossary.find_terms(mask_markup(text)[0]), translation)]
+    print(f"🧮 Übersetzung: {len(entries)} offene Zeilen, {len(texts)} eindeutige Texte, davon {len(usable)} im Übersetzungsgedächtnis.")
+
+def run_articles_stage(documents, dry_run):
+    """Stufe 3: '$the_$'-Platzhalter in den Artikel-Dateien korrigieren – nur im Speicher."""
+    article_documents = {filepath: document for filepath, document in documents.items()
+                         if fnmatch.fnmatch(os.path.basename(filepath), ARTICLE_FILES_GLOB)}
+    if not article_documents:
+        print(f"📝 Artikel: keine Datei passt zu '{ARTICLE_FILES_GLOB}'.")
+        return
+    for filepath, document in article_documents.items():
+        if dry_run:
+            pending = fix_articles.collect_article_entries(document)
+            print(f"📝 Artikel: {len(pending)} Platzhalter in '{os.path.basename(filepath)}'.")
+            continue
+        print(f"\n📝 Artikel-Korrektur für '{os.path.basename(filepath)}'...")
+        fix_articles.fix_articles_in_document(document)
+    if not dry_run:
+        print(f"📚 Artikel-Lexikon: {fix_articles.article_lexicon.hits} Treffer, {fix_articles.article_lexicon.misses} neu aufzulösen.")
+
+def write_documents(documents, sources_to_remove, dry_run):
+    """Schreibt jede geänderte Datei genau einmal. Gibt (geschriebene Pfade, alles erfolgreich) zurück."""
+    written, all_saved = [], True
+    for filepath, document in documents.items():
+        if not document.modified:
+            continue
+        if dry_run:
+            print(f"  📄 Würde schreiben: {filepath}")
+            written.append(filepath)
+            continue
+        try:
+            with translate_files.metrics.timed("file_write"):
+                document.save(filepath)
+            written.append(filepath)
+        except Exception as e:
+            print(f"  🛑 Fehler beim Schreiben in {filepath}: {e}")
+            all_saved = False
+            continue
+        english_path = sources_to_remove.get(filepath)
+        if english_path:
+            try:
+                os.remove(english_path)
+            except Exception as e:
+                print(f"Fehler beim Löschen von {english_path}: {e}")
+    return written, all_saved
+
+def run_pipeline(main_folder, stages=STAGES, dry_run=False, only=None, sync=False):
+    """
+    Führt die gewählten Stufen (prepare → translate → articles) nacheinander aus. Jede Datei wird einmal
+    gelesen, die Dokumente wandern im Speicher von Stufe zu Stufe und jede geänderte Datei wird am Ende
+    genau einmal geschrieben. Mit dry_run wird nichts übersetzt und nichts geschrieben.
+    """
+    print(f"--- Starte Pipeline ({' → '.join(stages)}) in: '{main_folder}'{' [Trockenlauf]' if dry_run else ''} ---")
+    if not os.path.isdir(main_folder):
+        print(f"🛑 FEHLER: Der angegebene Ordner '{main_folder}' existiert nicht.")
+        return
+
+    english_paths, german_paths = discover_files(main_folder, only)
+    documents, sources_to_remove, manifest_updates = {}, {}, {}
+    manifest = update_files.load_manifest(main_folder) if sync else {}
+    if "prepare" in stages:
+        sources_to_remove, manifest_updates = run_prepare_stage(main_folder, english_paths, documents, sync, manifest)
+
+    # Deutsche Dateien, die nicht gerade aus einer englischen Quelle entstanden sind, einmal einlesen.
+    for filepath in german_paths:
+        if filepath in documents:
+            continue
+        try:
+            with translate_files.metrics.timed("file_read"):
+                documents[filepath] = LocDocument.load(filepath)
+        except Exception as e:
+            print(f"  🛑 Schwerwiegender Fehler bei Datei {os.path.basename(filepath)}: {e}")
+    print(f"📂 {len(documents)} Dateien im Speicher.")
+
+    translated = False
+    if "translate" in stages:
+        if dry_run:
+            report_translation(documents)
+        else:
+            translated = translate_files.translate_documents({translate_files.TARGET_LANGUAGE: documents}, save_files=False)
+
+    if "articles" in stages:
+        run_articles_stage(documents, dry_run)
+
+    written, all_saved = write_documents(documents, sources_to_remove, dry_run)
+    if not dry_run:
+        # Erst jetzt sind die Übersetzungen auf der Platte: Journal-Einträge der geladenen und gespeicherten
+        # (bzw. unveränderten) Dateien verwerfen – Einträge von Dateien außerhalb von --only bleiben erhalten –
+        # und das Manifest fortschreiben.
+        if translated:
+            translate_files.journal.discard(filepath for filepath, document in documents.items() if not document.modified)
+        if sync:
+            for filepath, (relative_path, manifest_entry) in manifest_updates.items():
+                if filepath in written:
+                    manifest[relative_path] = manifest_entry
+            update_files.save_manifest(main_folder, manifest)
+        translate_files.write_metrics_report()
+
+    print("\n--- Pipeline abgeschlossen ---")
+    verb = "würden geschrieben" if dry_run else "geschrieben"
+    print(f"✨ {len(documents)} Dateien verarbeitet, {len(written)} {verb}, {len(documents) - len(written)} unverändert.")
+
+def parse_stages(value):
+    stages = [stage.strip() for stage in value.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unbekannte Stufe(n): {', '.join(unknown)} (erlaubt: {', '.join(STAGES)})")
+    # Die Reihenfolge der Stufen ist fest, unabhängig von der Angabe auf der Kommandozeile.
+    return tuple(stage for stage in STAGES if stage in stages)
+
+def main():
+    parser = argparse.ArgumentParser(description="Vorbereiten, Übersetzen und Artikel korrigieren in einem Durchgang.")
+    parser.add_argument("folder", nargs="?", default=folder_to_process, help="Hauptordner (Standard: FOLDER_PATH aus der .env)")
+    parser.add_argument("--stages", type=parse_stages, default=STAGES, help="Kommagetrennte Stufen, z. B. translate,articles (Standard: alle)")
+    parser.add_argument("--dry-run", action="store_true", help="Nur anzeigen, was passieren würde: keine Anfragen, keine Dateien schreiben")
+    parser.add_argument("--only", metavar="GLOB", help="Nur Dateien, deren Name oder relativer Pfad zum Muster passt")
+    parser.add_argument("--sync", action="store_true", help="Vorbereitung als inkrementeller Abgleich (wie update_files.py --sync)")
+    args = parser.parse_args()
+    if not args.folder or not os.path.isdir(args.folder):
+        print("🛑 FEHLER: FOLDER_PATH in der .env-Datei ist nicht gesetzt oder kein gültiger Ordner.")
+        return
+    try:
+        run_pipeline(args.folder, args.stages, args.dry_run, args.only, args.sync)
+    finally:
+        translate_files.translation_memory.close()
+        translate_files.failure_queue.close()
+        fix_articles.article_lexicon.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# Zentrale, versionierte Prompt-Vorlage für die Übersetzung.
+# Die festen Regeln stehen in einer System-Anweisung, getrennt vom wechselnden Teil jeder Anfrage (Dateiname als
+# Kontext, passende Glossar-Einträge, zu übersetzende Texte). Gemini schickt und berechnet sie bei jeder Anfrage mit.
+
+# PROMPT_VERSION bei jeder inhaltlichen Änderung an dieser Datei erhöhen: alte Einträge im
+# Übersetzungsgedächtnis gelten dann als ungültig.
+PROMPT_VERSION = 5
+
+# Regeln 2–6 gelten für jede Zielsprache und stehen deshalb in beiden System-Anweisungen.
+MARKUP_RULES = """2.  **KEEP PLACEHOLDERS:** Tokens like `{0}` or `{1}` stand for game code. Keep each one exactly once and unchanged.
+3.  **DO NOT TRANSLATE GAME CODE:** Preserve text inside `[]` EXACTLY.
+4.  **PRESERVE IN-TEXT VARIABLES:** Preserve text inside `$$` EXACTLY.
+5.  **PRESERVE FORMATTING MARKERS:** Preserve single words starting with `#` EXACTLY.
+6.  **PRESERVE ICON CODES:** Preserve text from `@` to `!` EXACTLY."""
+
+TRANSLATION_SYSTEM_INSTRUCTION = f"""You are an expert translator for video game mods, specifically for a "Lord of the Rings" mod for the game "Crusader Kings 3".
+Each request names the file(s) the content comes from, may contain a GLOSSARY, and contains either a JSON array of English strings or a single English text. Translate it to German.
+**CRITICAL INSTRUCTIONS:**
+1.  **USE OFFICIAL TOLKIEN TRANSLATIONS:** ('Frodo Baggins' -> 'Frodo Beutlin'). Do not translate names that remain in English ('Gondor'). If a GLOSSARY is given, you MUST use exactly its German terms (inflected if grammar requires it).
+{MARKUP_RULES}
+7.  **USE CK3 TERMINOLOGY:** ('vassal' -> 'Vasall').
+8.  **TONE:** Use the informal German "du/dein/euch".
+9.  **OUTPUT FORMAT:** For a JSON array, your entire output MUST be a single, valid JSON array of strings with one translation per entry, in the same order. For a single text, return ONLY the final translated German text."""
+
+# Mehrsprachiger Modus (multi_locale.py): eine Anfrage liefert die Übersetzungen in alle Zielsprachen auf einmal.
+MULTI_LOCALE_SYSTEM_INSTRUCTION = f"""You are an expert translator for video game mods, specifically for a "Lord of the Rings" mod for the game "Crusader Kings 3".
+Each request names the file(s) the content comes from and the TARGET LANGUAGES, may contain a GLOSSARY for German, and contains either a JSON array of English strings or a single English text. Translate it into every target language.
+**CRITICAL INSTRUCTIONS:**
+1.  **USE OFFICIAL TOLKIEN TRANSLATIONS** of each target language (German: 'Frodo Baggins' -> 'Frodo Beutlin'). Do not translate names that remain in English ('Gondor'). If a GLOSSARY is given, you MUST use exactly its German terms in the German translation (inflected if grammar requires it).
+{MARKUP_RULES}
+7.  **USE CK3 TERMINOLOGY** of the official translation of each language (German: 'vassal' -> 'Vasall').
+8.  **TONE:** Use the informal form of address (German "du", French "tu", Spanish "tú").
+9.  **OUTPUT FORMAT:** For a JSON array, your entire output MUST be a single, valid JSON array with one object per entry, in the same order. Each object maps every target language, spelled exactly as in the request, to its translation, e.g. [{{"german": "...", "french": "..."}}]. For a single text with one target language, return ONLY the final translated text."""
+
+
+def glossary_section(glossary_lines):
+    """Glossar-Abschnitt für die Anfrage; leer, wenn kein Begriff aus dem Glossar vorkommt."""
+    if not glossary_lines:
+        return ""
+    return f"""**GLOSSARY:**
+{glossary_lines}
+"""
+
+
+def batch_prompt(filename, json_input, glossary_lines=""):
+    """Der pro Anfrage wechselnde Teil eines Batch-Prompts: Dateikontext, passende Glossar-Einträge und JSON-Array."""
+    return f"""**CONTEXT:** File(s): `{filename}`.
+{glossary_section(glossary_lines)}JSON array to translate:
+{json_input}"""
+
+
+def single_line_prompt(filename, text, glossary_lines=""):
+    """Der pro Anfrage wechselnde Teil eines Einzelzeilen-Prompts."""
+    return f"""**CONTEXT:** File(s): `{filename}`.
+{glossary_section(glossary_lines)}English text: "{text}"
+---
+German translation:"""
+
+
+def locale_batch_prompt(filename, json_input, languages, glossary_lines=""):
+    """Batch-Prompt des mehrsprachigen Modus: wie `batch_prompt`, zusätzlich mit der Liste der Zielsprachen."""
+    return f"""**CONTEXT:** File(s): `{filename}`.
+**TARGET LANGUAGES:** {", ".join(languages)}
+{glossary_section(glossary_lines)}JSON array to translate:
+{json_input}"""
+
+
+def locale_single_line_prompt(filename, text, language, glossary_lines=""):
+    """Einzelzeilen-Prompt des mehrsprachigen Modus für genau eine Zielsprache."""
+    return f"""**CONTEXT:** File(s): `{filename}`.
+**TARGET LANGUAGES:** {language}
+{glossary_section(glossary_lines)}English text: "{text}"
+---
+Translation:"""
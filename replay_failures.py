@@ -0,0 +1,101 @@
+import argparse
+import os
+import time
+import translate_files
+from translate_files import failure_queue, metrics, write_metrics_report, is_pure_variable, FAILURE_MAX_ATTEMPTS
+from paradox_yml import LocDocument
+
+def load_queued_documents(items):
+    """
+    Lädt nur die Dateien, zu denen die Warteschlange Einträge hat – kein Durchlauf durch den ganzen Baum.
+    Die Einträge werden über ihren Key gesucht, nicht über die Zeilennummer, damit sie auch nach einer
+    Bearbeitung der Datei noch passen. Gibt ({Sprache: {Dateipfad: LocDocument}}, {Dateipfad: Keys},
+    erledigte (Dateipfad, Key)-Paare) zurück; erledigt sind Keys, die fehlen, inzwischen übersetzt sind oder
+    nichts mehr zu übersetzen haben (leerer Wert oder reine Variable).
+    """
+    items_by_file = {}
+    for item in items:
+        items_by_file.setdefault(item["file"], []).append(item)
+
+    documents_by_language, only_keys, obsolete = {}, {}, []
+    for filepath, file_items in items_by_file.items():
+        if not os.path.exists(filepath):
+            print(f"  🗑️ '{filepath}' existiert nicht mehr, {len(file_items)} Einträge werden entfernt.")
+            obsolete.extend((filepath, item["key"]) for item in file_items)
+            continue
+        try:
+            with metrics.timed("file_read"):
+                document = LocDocument.load(filepath)
+        except Exception as e:
+            print(f"  🛑 Schwerwiegender Fehler bei Datei {os.path.basename(filepath)}: {e}")
+            continue
+        for item in file_items:
+            entry = document.index.get(item["key"])
+            if entry is None or entry.translated or not entry.value or is_pure_variable(entry.value):
+                obsolete.append((filepath, item["key"]))
+                continue
+            if entry.text != item["source"]:
+                print(f"  ℹ️ '{item['key']}' in '{os.path.basename(filepath)}' hat inzwischen einen anderen Text, übersetze den aktuellen.")
+            only_keys.setdefault(filepath, set()).add(item["key"])
+        if filepath in only_keys:
+            documents_by_language.setdefault(file_items[0]["language"], {})[filepath] = document
+    return documents_by_language, only_keys, obsolete
+
+def print_queue():
+    """Zeigt alle Einträge der Warteschlange mit Versuchen, nächstem Versuch und letztem Fehlergrund."""
+    items = failure_queue.items(due_only=False, include_dead=True)
+    if not items:
+        print("✅ Die Fehler-Warteschlange ist leer.")
+        return
+    now = time.time()
+    for item in items:
+        if item["attempts"] >= FAILURE_MAX_ATTEMPTS:
+            status = "aufgegeben"
+        elif item["next_attempt_at"] <= now:
+            status = "fällig"
+        else:
+            status = f"in {int(item['next_attempt_at'] - now)} s"
+        print(f"{item['file']}:{item['line'] + 1} {item['key']} [{item['language']}] "
+              f"{item['attempts']}/{FAILURE_MAX_ATTEMPTS} Versuche, {status}: {item['reason']}")
+        print(f"    \"{item['source']}\"")
+    stats = failure_queue.stats()
+    print(f"\n📮 {stats['pending']} wartend, {stats['dead']} aufgegeben.")
+
+def replay_failures(force=False, include_dead=False):
+    """
+    Übersetzt nur die Zeilen aus der Fehler-Warteschlange erneut, gebündelt und parallel wie ein normaler Lauf.
+    Ohne force nur Einträge, deren Wartezeit abgelaufen ist; aufgegebene Einträge nur mit include_dead.
+    """
+    items = failure_queue.items(due_only=not force, include_dead=include_dead)
+    stats = failure_queue.stats()
+    print(f"--- Wiederhole {len(items)} Zeilen aus der Fehler-Warteschlange ({stats['pending']} wartend, {stats['dead']} aufgegeben) ---")
+    if not items:
+        print("✅ Nichts fällig. Mit --force werden auch Einträge versucht, deren Wartezeit noch läuft.")
+        return
+
+    documents_by_language, only_keys, obsolete = load_queued_documents(items)
+    if obsolete:
+        print(f"🧹 {failure_queue.resolve_many(obsolete)} Einträge sind erledigt (Key entfernt, schon übersetzt oder nichts zu übersetzen).")
+
+    if documents_by_language:
+        translate_files.translate_documents(documents_by_language, only_keys=only_keys)
+    write_metrics_report()
+
+def main():
+    parser = argparse.ArgumentParser(description="Nur die Zeilen aus der Fehler-Warteschlange erneut übersetzen.")
+    parser.add_argument("--list", action="store_true", help="Warteschlange anzeigen, nichts übersetzen")
+    parser.add_argument("--force", action="store_true", help="Auch Einträge versuchen, deren Wartezeit noch läuft")
+    parser.add_argument("--include-dead", action="store_true", help=f"Auch Einträge nach {FAILURE_MAX_ATTEMPTS} Fehlversuchen erneut versuchen")
+    args = parser.parse_args()
+    try:
+        if args.list:
+            print_queue()
+        else:
+            replay_failures(args.force, args.include_dead)
+    finally:
+        translate_files.translation_memory.close()
+        failure_queue.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from translation_journal import atomic_write_lines
+
+# Obergrenzen der Latenz-Buckets in Sekunden (wie die Prometheus-Standardwerte, ergänzt um lange API-Aufrufe)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+METRIC_PREFIX = "ck3_translation"
+
+
+class LatencyHistogram:
+    """Latenzverteilung einer Operation: feste Buckets für Prometheus plus alle Messwerte für Quantile."""
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.samples = []
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.bucket_counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.samples.append(seconds)
+        self.total += seconds
+
+    def quantile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self):
+        count = len(self.samples)
+        return {
+            "count": count,
+            "sum_seconds": round(self.total, 4),
+            "avg_seconds": round(self.total / count, 4) if count else 0.0,
+            "p50_seconds": round(self.quantile(0.5), 4),
+            "p95_seconds": round(self.quantile(0.95), 4),
+            "max_seconds": round(max(self.samples), 4) if count else 0.0,
+        }
+
+
+class RunMetrics:
+    """
+    Sammelt Messwerte eines Laufs: Latenz-Histogramme pro Operation, Tokens pro Operation, Ereigniszähler
+    (fehlgeschlagene Batches, Einzelmodus, Rate-Limits, ...) und den Fortschritt der offenen Zeilen.
+    Wird von allen Worker-Threads gemeinsam genutzt. `report()` liefert alles als Dictionary,
+    `write_json()` und `write_prometheus()` schreiben es für den Vergleich verschiedener Läufe weg.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.started_at = clock()
+        self.latencies = {}
+        self.tokens = {}  # Operation -> [Prompt-Tokens, Antwort-Tokens]
+        self.counters = {}
+        self.lines_total = 0
+        self.lines_done = 0
+        self._progress_started = None
+
+    def observe(self, operation, seconds):
+        with self._lock:
+            self.latencies.setdefault(operation, LatencyHistogram()).observe(seconds)
+
+    @contextmanager
+    def timed(self, operation):
+        """Misst die Dauer des Blocks als Latenz von `operation` (auch wenn er mit einer Ausnahme endet)."""
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.observe(operation, self._clock() - start)
+
+    def add_tokens(self, operation, prompt_tokens, response_tokens):
+        with self._lock:
+            tokens = self.tokens.setdefault(operation, [0, 0])
+            tokens[0] += prompt_tokens
+            tokens[1] += response_tokens
+
+    def count(self, event, amount=1):
+        with self._lock:
+            self.counters[event] = self.counters.get(event, 0) + amount
+
+    def start_progress(self, lines_total):
+        """Beginnt die Fortschrittsmessung für `lines_total` offene Zeilen."""
+        with self._lock:
+            self.lines_total += lines_total
+            if self._progress_started is None:
+                self._progress_started = self._clock()
+
+    def advance(self, lines=1):
+        with self._lock:
+            self.lines_done += lines
+
+    def lines_per_second(self):
+        if self._progress_started is None:
+            return 0.0
+        elapsed = self._clock() - self._progress_started
+        return self.lines_done / elapsed if elapsed > 0 else 0.0
+
+    def eta_seconds(self):
+        """Geschätzte Restdauer aus den noch offenen Zeilen und dem bisherigen Durchsatz (None, solange unbekannt)."""
+        rate = self.lines_per_second()
+        if not rate:
+            return None
+        return max(0, self.lines_total - self.lines_done) / rate
+
+    def progress_line(self):
+        eta = self.eta_seconds()
+        eta_text = time.strftime("%H:%M:%S", time.gmtime(eta)) if eta is not None else "?"
+        percent = self.lines_done / self.lines_total * 100 if self.lines_total else 100.0
+        return (f"📈 Fortschritt: {self.lines_done}/{self.lines_total} Zeilen ({percent:.0f}%), "
+                f"{self.lines_per_second():.1f} Zeilen/s, Restzeit ca. {eta_text}")
+
+    def rate(self, numerator, denominator):
+        total = self.counters.get(denominator, 0)
+        return round(self.counters.get(numerator, 0) / total, 4) if total else 0.0
+
+    def input_tokens_per_line(self):
+        """
+        Eingabe-Tokens pro übersetzter Zeile für Anfragen mit System-Anweisung: der wechselnde Teil ohne die
+        Anweisung, dasselbe mit der Anweisung (so geht jede Anfrage raus) und was das Backend abgerechnet hat.
+        """
+        lines = self.counters.get("lines_translated", 0)
+        payload = self.counters.get("payload_tokens", 0)
+        instructions = self.counters.get("instruction_tokens", 0)
+        billed = self.counters.get("billed_prompt_tokens", 0)
+        return {
+            "excluding_instruction": round(payload / lines, 2) if lines else 0.0,
+            "including_instruction": round((payload + instructions) / lines, 2) if lines else 0.0,
+            "billed": round(billed / lines, 2) if lines else 0.0,
+        }
+
+    def report(self):
+        with self._lock:
+            duration = self._clock() - self.started_at
+            prompt_tokens = sum(tokens[0] for tokens in self.tokens.values())
+            response_tokens = sum(tokens[1] for tokens in self.tokens.values())
+            return {
+                "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "duration_seconds": round(duration, 3),
+                "lines": {
+                    "total": self.lines_total,
+                    "done": self.lines_done,
+                    "translated": self.counters.get("lines_translated", 0),
+                    "failed": self.counters.get("lines_failed", 0),
+                    "per_second": round(self.lines_per_second(), 3),
+                },
+                "rates": {
+                    "batch_failure": self.rate("batches_failed", "batches"),
+                    "single_line_fallback": self.rate("single_line_fallbacks", "batches"),
+                    "single_line_failure": self.rate("single_line_failed", "single_line_fallbacks"),
+                },
+                "input_tokens_per_line": self.input_tokens_per_line(),
+                "tokens": {
+                    "prompt": prompt_tokens,
+                    "response": response_tokens,
+                    "by_operation": {operation: {"prompt": tokens[0], "response": tokens[1]}
+                                     for operation, tokens in sorted(self.tokens.items())},
+                },
+                "counters": dict(sorted(self.counters.items())),
+                "latency": {operation: histogram.summary() for operation, histogram in sorted(self.latencies.items())},
+            }
+
+    def write_json(self, path):
+        atomic_write_lines(path, [json.dumps(self.report(), ensure_ascii=False, indent=2)], encoding='utf-8')
+
+    def write_prometheus(self, path):
+        """Schreibt die Messwerte im Textformat für den Textfile-Collector des Prometheus Node Exporters."""
+        report = self.report()
+        lines = [
+            f"# HELP {METRIC_PREFIX}_latency_seconds Dauer der Operationen eines Übersetzungslaufs.",
+            f"# TYPE {METRIC_PREFIX}_latency_seconds histogram",
+        ]
+        with self._lock:
+            histograms = sorted(self.latencies.items())
+            for operation, histogram in histograms:
+                cumulative = 0
+                for upper, bucket_count in zip(LATENCY_BUCKETS + ("+Inf",), histogram.bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'{METRIC_PREFIX}_latency_seconds_bucket{{operation="{operation}",le="{upper}"}} {cumulative}')
+                lines.append(f'{METRIC_PREFIX}_latency_seconds_sum{{operation="{operation}"}} {histogram.total:.6f}')
+                lines.append(f'{METRIC_PREFIX}_latency_seconds_count{{operation="{operation}"}} {len(histogram.samples)}')
+
+        lines += [f"# TYPE {METRIC_PREFIX}_tokens_total counter"]
+        for operation, tokens in report["tokens"]["by_operation"].items():
+            for kind in ("prompt", "response"):
+                lines.append(f'{METRIC_PREFIX}_tokens_total{{operation="{operation}",kind="{kind}"}} {tokens[kind]}')
+        lines += [f"# TYPE {METRIC_PREFIX}_events_total counter"]
+        for event, value in report["counters"].items():
+            lines.append(f'{METRIC_PREFIX}_events_total{{event="{event}"}} {value}')
+        lines += [f"# TYPE {METRIC_PREFIX}_rate gauge"]
+        for name, value in report["rates"].items():
+            lines.append(f'{METRIC_PREFIX}_rate{{rate="{name}"}} {value}')
+        lines += [
+            f"# TYPE {METRIC_PREFIX}_lines gauge",
+            f'{METRIC_PREFIX}_lines{{state="total"}} {report["lines"]["total"]}',
+            f'{METRIC_PREFIX}_lines{{state="done"}} {report["lines"]["done"]}',
+            f"# TYPE {METRIC_PREFIX}_lines_per_second gauge",
+            f'{METRIC_PREFIX}_lines_per_second {report["lines"]["per_second"]}',
+            f"# TYPE {METRIC_PREFIX}_run_duration_seconds gauge",
+            f'{METRIC_PREFIX}_run_duration_seconds {report["duration_seconds"]}',
+        ]
+        atomic_write_lines(path, [line + "\n" for line in lines], encoding='utf-8')
@@ -1,170 +1,666 @@
 import os
 import time
-import re
 import json
-import google.generativeai as genai
 from dotenv import load_dotenv
+from translation_engine import AdaptiveBatchBudget, BatchEngine, RateLimiter, call_with_backoff, estimate_tokens, is_rate_limit_error
+from translation_memory import TranslationMemory
+from markup_mask import mask_markup, unmask_markup
+from translation_journal import TranslationJournal
+from failure_queue import FailureQueue
+from paradox_yml import LocDocument
+from translation_backends import get_backend
+from run_metrics import RunMetrics
+from glossary import Glossary
+from prompts import (PROMPT_VERSION, TRANSLATION_SYSTEM_INSTRUCTION, MULTI_LOCALE_SYSTEM_INSTRUCTION,
+                     batch_prompt, single_line_prompt, locale_batch_prompt, locale_single_line_prompt)
 
 load_dotenv()
 
 folder_to_translate = os.getenv("FOLDER_PATH")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-flash')
-
 # --- Globale Einstellungen ---
-TRANSLATION_MARKER = "#~TR~"
+# Obergrenze an Einträgen pro Batch; die eigentliche Größe bestimmt das Token-Budget
 BATCH_SIZE = 50
-ERROR_LOG_FILE = "translation_errors.log"
+# Höchstzahl an Dateinamen, die ein dateiübergreifender Batch als Kontext im Prompt nennt
+MAX_CONTEXT_FILES = 5
+TARGET_LANGUAGE = "german"
+
+# --- Übersetzungsgedächtnis ---
+# Einträge sind an PROMPT_VERSION aus prompts.py gebunden und werden bei einer neuen Version ungültig.
+TRANSLATION_MEMORY_FILE = os.getenv("TRANSLATION_MEMORY_FILE", "translation_memory.sqlite")
+TRANSLATION_MEMORY_MAX_ENTRIES = int(os.getenv("TRANSLATION_MEMORY_MAX_ENTRIES", "200000"))
+translation_memory = TranslationMemory(TRANSLATION_MEMORY_FILE, PROMPT_VERSION, TRANSLATION_MEMORY_MAX_ENTRIES)
+
+# --- Glossar ---
+# Verbindliche Übersetzungen (Englisch<TAB>Deutsch). Pro Batch kommen nur die Einträge in den Prompt,
+# die in dessen Texten vorkommen; Übersetzungen, denen ein geforderter Begriff fehlt, werden erneut eingereiht.
+# Standard ist das mitgelieferte Glossar neben diesem Skript, unabhängig vom aktuellen Verzeichnis.
+GLOSSARY_FILE = os.getenv("GLOSSARY_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "glossary.tsv"))
+glossary = Glossary.load(GLOSSARY_FILE)
+# Das Glossar enthält deutsche Begriffe; andere Zielsprachen werden ohne Glossar übersetzt.
+NO_GLOSSARY = Glossary()
+
+# --- Absturzsicherheit ---
+# Journal aller fertigen Batches; halb übersetzte Dateien werden zusätzlich alle JOURNAL_FLUSH_SECONDS gespeichert.
+TRANSLATION_JOURNAL_FILE = os.getenv("TRANSLATION_JOURNAL_FILE", "translation_journal.jsonl")
+JOURNAL_FLUSH_SECONDS = int(os.getenv("JOURNAL_FLUSH_SECONDS", "60"))
+journal = TranslationJournal(TRANSLATION_JOURNAL_FILE)
+
+# --- Fehler-Warteschlange ---
+# Zeilen, die auch im Einzelmodus scheitern, mit Grund und Zahl der Versuche; `replay_failures.py` übersetzt
+# nur diese erneut. Die Wartezeit zwischen zwei Versuchen verdoppelt sich, nach FAILURE_MAX_ATTEMPTS ist Schluss.
+FAILURE_QUEUE_FILE = os.getenv("FAILURE_QUEUE_FILE", "translation_failures.sqlite")
+FAILURE_MAX_ATTEMPTS = int(os.getenv("FAILURE_MAX_ATTEMPTS", "5"))
+FAILURE_RETRY_BASE_SECONDS = int(os.getenv("FAILURE_RETRY_BASE_SECONDS", "60"))
+failure_queue = FailureQueue(FAILURE_QUEUE_FILE, FAILURE_MAX_ATTEMPTS, FAILURE_RETRY_BASE_SECONDS)
+# Grund des letzten Fehlschlags im Einzelmodus pro (Quelltext, Sprache), für den Eintrag in der Warteschlange
+failure_reasons = {}
+
+# --- Token-basierte Batch-Größe ---
+# Budget für Eingabe plus erwartete Ausgabe eines Batches; passt sich während des Laufs an die Erfolgsquote an.
+BATCH_TOKEN_BUDGET = int(os.getenv("BATCH_TOKEN_BUDGET", "3000"))
+MIN_BATCH_TOKEN_BUDGET = int(os.getenv("MIN_BATCH_TOKEN_BUDGET", "400"))
+MAX_BATCH_TOKEN_BUDGET = int(os.getenv("MAX_BATCH_TOKEN_BUDGET", "8000"))
+OUTPUT_TOKEN_FACTOR = 1.3
+JSON_ENTRY_OVERHEAD_TOKENS = 3
+batch_budget = AdaptiveBatchBudget(BATCH_TOKEN_BUDGET, MIN_BATCH_TOKEN_BUDGET, MAX_BATCH_TOKEN_BUDGET)
+
+# --- Parallelität und Quota (Standard: Gemini Free Tier) ---
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "4"))
+REQUESTS_PER_MINUTE = int(os.getenv("REQUESTS_PER_MINUTE", "15"))
+TOKENS_PER_MINUTE = int(os.getenv("TOKENS_PER_MINUTE", "1000000"))
+rate_limiter = RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE)
 
+# --- Messwerte ---
+# JSON-Bericht jedes Laufs (leer = keiner) und optional eine Textdatei für den Prometheus Node Exporter.
+METRICS_REPORT_FILE = os.getenv("METRICS_REPORT_FILE", "translation_run_report.json")
+METRICS_PROMETHEUS_FILE = os.getenv("METRICS_PROMETHEUS_FILE", "")
+# Abstand in Sekunden zwischen zwei Fortschrittsmeldungen mit Restzeit
+PROGRESS_SECONDS = int(os.getenv("PROGRESS_SECONDS", "10"))
+metrics = RunMetrics()
+
+def generate_content(prompt, operation="request", system_instruction=None):
+    """
+    Schickt einen Prompt an das aktive Backend – gedrosselt und mit Backoff bei 429-Fehlern.
+    Latenz und Tokens jedes API-Aufrufs werden unter `operation` erfasst, die Wartezeit auf die Quota getrennt davon.
+    Die optionale System-Anweisung geht getrennt vom Prompt an das Backend.
+    """
+    backend = get_backend()
+    api_seconds = []
+
+    def request():
+        start = time.monotonic()
+        try:
+            text, prompt_tokens, response_tokens = backend.generate_with_usage(prompt, system_instruction)
+        except Exception as e:
+            metrics.count("rate_limited" if is_rate_limit_error(e) else "api_errors")
+            raise
+        finally:
+            api_seconds.append(time.monotonic() - start)
+            metrics.observe(f"api_{operation}", api_seconds[-1])
+        metrics.add_tokens(operation, prompt_tokens, response_tokens)
+        if system_instruction:
+            # Für den Vorher-/Nachher-Vergleich im Laufbericht (siehe RunMetrics.input_tokens_per_line)
+            metrics.count("payload_tokens", estimate_tokens(prompt))
+            metrics.count("instruction_tokens", estimate_tokens(system_instruction))
+            metrics.count("billed_prompt_tokens", prompt_tokens)
+        return text
+
+    start = time.monotonic()
+    instruction_tokens = estimate_tokens(system_instruction) if system_instruction else 0
+    try:
+        return call_with_backoff(request, rate_limiter, estimate_tokens(prompt) + instruction_tokens)
+    finally:
+        metrics.observe("quota_wait", time.monotonic() - start - sum(api_seconds))
+
+def write_metrics_report():
+    """Schreibt den JSON-Laufbericht und, falls eingestellt, die Prometheus-Textdatei."""
+    try:
+        if METRICS_REPORT_FILE:
+            metrics.write_json(METRICS_REPORT_FILE)
+            print(f"📊 Laufbericht gespeichert in '{METRICS_REPORT_FILE}'.")
+        if METRICS_PROMETHEUS_FILE:
+            metrics.write_prometheus(METRICS_PROMETHEUS_FILE)
+    except Exception as e:
+        print(f"  🛑 Laufbericht konnte nicht geschrieben werden: {e}")
+
+def glossary_for(language):
+    return glossary if language == TARGET_LANGUAGE else NO_GLOSSARY
+
+@metrics.timed("translate_batch")
 def translate_batch_with_gemini(text_list, filename):
-    """Übersetzt eine ganze Liste (Batch) von Texten mit einer einzigen API-Anfrage."""
-    json_input = json.dumps(text_list, ensure_ascii=False)
-    prompt = f"""
-    You are an expert translator for video game mods, specifically for a "Lord of the Rings" mod for the game "Crusader Kings 3".
-    **CONTEXT:** You are translating content from the file named: `{filename}`.
-    **TASK:** You will receive a JSON array of English strings. Translate every string to German. Return a valid JSON array.
-    **CRITICAL INSTRUCTIONS:**
-    1.  **USE OFFICIAL TOLKIEN TRANSLATIONS:** ('Frodo Baggins' -> 'Frodo Beutlin'). Do not translate names that remain in English ('Gondor').
-    2.  **DO NOT TRANSLATE GAME CODE:** Preserve text inside `[]` EXACTLY.
-    3.  **PRESERVE IN-TEXT VARIABLES:** Preserve text inside `$$` EXACTLY.
-    4.  **PRESERVE FORMATTING MARKERS:** Preserve single words starting with `#` EXACTLY.
-    5.  **PRESERVE ICON CODES:** Preserve text from `@` to `!` EXACTLY.
-    6.  **USE CK3 TERMINOLOGY:** ('vassal' -> 'Vasall').
-    7.  **TONE:** Use the informal German "du/dein/euch".
-    8.  **OUTPUT FORMAT:** Your entire output MUST be a single, valid JSON array of strings.
-    ---
-    JSON array to translate:
-    {json_input}
     """
+    Übersetzt eine ganze Liste (Batch) von Texten mit einer einzigen API-Anfrage.
+    Bereits bekannte Texte kommen aus dem Übersetzungsgedächtnis, nur der Rest geht an das Modell.
+    Paradox-Markup wird vorher durch Platzhalter ersetzt; Texte, deren Platzhalter nicht vollständig
+    zurückkommen, erhalten None und müssen erneut übersetzt werden. Gibt None zurück, wenn der ganze Batch scheitert.
+    """
+    # Glossar-Begriffe im maskierten Text suchen, also ohne das Markup, das das Modell nicht sieht.
+    masked_by_text = {text: mask_markup(text) for text in dict.fromkeys(text_list)}
+    required_terms = {text: glossary.find_terms(masked_text) for text, (masked_text, _) in masked_by_text.items()}
+
+    known = translation_memory.get_many(text_list, TARGET_LANGUAGE)
+    # Auch Treffer aus dem Gedächtnis müssen zum aktuellen Glossar passen.
+    known = {text: translation for text, translation in known.items()
+             if not glossary.violations(required_terms[text], translation)}
+    missing = [text for text in masked_by_text if text not in known]
+    if not missing:
+        return [known[text] for text in text_list]
+
+    masked = [masked_by_text[text] for text in missing]
+    json_input = json.dumps([masked_text for masked_text, _ in masked], ensure_ascii=False)
+    batch_terms = list(dict.fromkeys(entry for text in missing for entry in required_terms[text]))
+    metrics.count("glossary_terms_injected", len(batch_terms))
+    prompt = batch_prompt(filename, json_input, Glossary.format_entries(batch_terms))
     try:
-        response = model.generate_content(prompt)
-        cleaned_response = response.text.strip().removeprefix("```json").removesuffix("```").strip()
+        response = generate_content(prompt, "batch", TRANSLATION_SYSTEM_INSTRUCTION)
+        cleaned_response = response.strip().removeprefix("```json").removesuffix("```").strip()
         translated_list = json.loads(cleaned_response)
-        if len(translated_list) == len(text_list): return translated_list
-        return None
+        if len(translated_list) != len(missing) or not all(isinstance(t, str) for t in translated_list): return None
     except Exception as e:
         print(f"  🛑 Fehler bei der Batch-API-Anfrage: {e}")
         return None
 
-def translate_single_line_safely(english_text, filename):
-    """Übersetzt eine einzelne Zeile. Dient als Sicherheits-Fallback, wenn eine Batch-Anfrage fehlschlägt."""
-    prompt = f"""
-    You are an expert translator for video game mods, specifically for a "Lord of the Rings" mod for the game "Crusader Kings 3".
-    **CONTEXT:** You are translating content from the file named: `{filename}`.
-    **TASK:** Translate the single following English text to German.
-    **CRITICAL INSTRUCTIONS:**
-    1.  **USE OFFICIAL TOLKIEN TRANSLATIONS:** ('Frodo Baggins' -> 'Frodo Beutlin'). Do not translate names that remain in English ('Gondor').
-    2.  **DO NOT TRANSLATE GAME CODE:** Preserve text inside `[]` EXACTLY.
-    3.  **PRESERVE IN-TEXT VARIABLES:** Preserve text inside `$$` EXACTLY.
-    4.  **PRESERVE FORMATTING MARKERS:** Preserve single words starting with `#` EXACTLY.
-    5.  **PRESERVE ICON CODES:** Preserve text from `@` to `!` EXACTLY.
-    6.  **USE CK3 TERMINOLOGY:** ('vassal' -> 'Vasall').
-    7.  **TONE:** Use the informal German "du/dein/euch".
-    8.  **OUTPUT:** Return ONLY the final translated German text.
-    ---
-    English text: "{english_text}"
-    ---
-    German translation:
+    restored = []
+    for text, (_, originals), translated_text in zip(missing, masked, translated_list):
+        unmasked_text = unmask_markup(translated_text, originals)
+        if unmasked_text is None:
+            print(f"    - ⚠️ Platzhalter nicht vollständig zurückgekommen: {text}")
+            continue
+        violations = glossary.violations(required_terms[text], unmasked_text)
+        if violations:
+            # Nur diese Zeile wird erneut eingereiht, der Rest des Batches bleibt gültig.
+            metrics.count("glossary_violations")
+            print(f"    - ⚠️ Glossar nicht eingehalten ({', '.join(target for _, target in violations)} fehlt): {text}")
+            continue
+        restored.append((text, unmasked_text))
+    translation_memory.put_many(restored, TARGET_LANGUAGE)
+    known.update(restored)
+    return [known.get(text) for text in text_list]
+
+@metrics.timed("translate_locale_batch")
+def translate_locale_batch(text_list, languages, filename):
+    """
+    Übersetzt einen Batch mit einer einzigen Anfrage in alle angegebenen Sprachen.
+    Bekannte Übersetzungen kommen pro Sprache aus dem Übersetzungsgedächtnis; gefragt werden nur die Texte
+    und Sprachen, die noch fehlen. Gibt {Quelltext: {Sprache: Übersetzung}} zurück – Sprachen, deren
+    Übersetzung unbrauchbar war, fehlen darin – oder None, wenn die Anfrage als Ganzes scheitert.
     """
+    masked_by_text = {text: mask_markup(text) for text in dict.fromkeys(text_list)}
+    required_terms = {language: {text: glossary_for(language).find_terms(masked_text)
+                                 for text, (masked_text, _) in masked_by_text.items()}
+                      for language in languages}
+
+    results = {text: {} for text in masked_by_text}
+    for language in languages:
+        for text, translation in translation_memory.get_many(list(masked_by_text), language).items():
+            if not Glossary.violations(required_terms[language][text], translation):
+                results[text][language] = translation
+    missing = {text: [language for language in languages if language not in results[text]] for text in masked_by_text}
+    request_texts = [text for text in masked_by_text if missing[text]]
+    if not request_texts:
+        return results
+    request_languages = [language for language in languages if any(language in missing[text] for text in request_texts)]
+
+    masked = [masked_by_text[text] for text in request_texts]
+    json_input = json.dumps([masked_text for masked_text, _ in masked], ensure_ascii=False)
+    # Das Glossar gilt nur für Deutsch; es kommen nur Begriffe aus Texten, deren deutsche Übersetzung noch fehlt.
+    batch_terms = list(dict.fromkeys(entry for language in request_languages for text in request_texts
+                                     if language in missing[text] for entry in required_terms[language][text]))
+    metrics.count("glossary_terms_injected", len(batch_terms))
+    prompt = locale_batch_prompt(filename, json_input, request_languages, Glossary.format_entries(batch_terms))
     try:
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        response = generate_content(prompt, "locale_batch", MULTI_LOCALE_SYSTEM_INSTRUCTION)
+        cleaned_response = response.strip().removeprefix("```json").removesuffix("```").strip()
+        translated_list = json.loads(cleaned_response)
+        if len(translated_list) != len(request_texts) or not all(isinstance(t, dict) for t in translated_list): return None
     except Exception as e:
-        print(f"    - 🛑 Fehler bei Einzelanfrage: {e}")
+        print(f"  🛑 Fehler bei der mehrsprachigen Batch-API-Anfrage: {e}")
         return None
 
-def translate_lotr_files(main_folder):
-    """Die Hauptfunktion des Skripts."""
-    print(f"--- Starte Batch-Übersetzungsprozess in: '{main_folder}' ---")
-    if not GEMINI_API_KEY or GEMINI_API_KEY == "DEIN_GEMINI_API_KEY":
-        print("🛑 FEHLER: Bitte füge deinen Gemini API Key in das Skript ein.")
-        return
-        
-    if os.path.exists(ERROR_LOG_FILE):
-        os.remove(ERROR_LOG_FILE)
-        print(f"Alte Log-Datei '{ERROR_LOG_FILE}' wurde gelöscht.")
-    
-    # === ÄNDERUNG HIER: Ein präziseres Muster, das Kommentare am Zeilenende korrekt erfasst ===
-    # Gruppe 1 (key_part): Erfasst Key, Einrückung und Versionsnummer.
-    # Gruppe 2 (value_part): Erfasst nur den Inhalt zwischen den Anführungszeichen.
-    # Gruppe 3 (comment_part): Erfasst optional einen echten Kommentar am Ende.
-    line_pattern = re.compile(r'^(.*?:\d*\s*)(".*?")(\s*#.*)?$')
+    restored = {language: [] for language in request_languages}
+    for text, (_, originals), translations in zip(request_texts, masked, translated_list):
+        for language in missing[text]:
+            translated_text = translations.get(language)
+            if not isinstance(translated_text, str):
+                continue
+            unmasked_text = unmask_markup(translated_text, originals)
+            if unmasked_text is None:
+                print(f"    - ⚠️ [{language}] Platzhalter nicht vollständig zurückgekommen: {text}")
+                continue
+            violations = Glossary.violations(required_terms[language][text], unmasked_text)
+            if violations:
+                metrics.count("glossary_violations")
+                print(f"    - ⚠️ [{language}] Glossar nicht eingehalten ({', '.join(target for _, target in violations)} fehlt): {text}")
+                continue
+            restored[language].append((text, unmasked_text))
+            results[text][language] = unmasked_text
+    for language, pairs in restored.items():
+        translation_memory.put_many(pairs, language)
+    return results
+
+def translate_batch(text_list, languages, filename):
+    """
+    Übersetzt einen Batch in die angegebenen Sprachen und gibt {Quelltext: {Sprache: Übersetzung}} oder None zurück.
+    Nur Deutsch nutzt den schlanken Batch-Prompt, mehrere oder andere Sprachen den mehrsprachigen.
+    """
+    if tuple(languages) != (TARGET_LANGUAGE,):
+        return translate_locale_batch(text_list, languages, filename)
+    translated_texts = translate_batch_with_gemini(text_list, filename)
+    if translated_texts is None:
+        return None
+    return {text: {TARGET_LANGUAGE: translated_text} if translated_text else {}
+            for text, translated_text in zip(text_list, translated_texts)}
+
+@metrics.timed("translate_single_line")
+def translate_single_line_safely(english_text, filename, language=TARGET_LANGUAGE):
+    """
+    Übersetzt eine einzelne Zeile. Dient als Sicherheits-Fallback, wenn eine Batch-Anfrage fehlschlägt.
+    Zuerst wird mit maskiertem Markup übersetzt; gehen dabei Platzhalter verloren, folgt ein Versuch mit dem Originaltext.
+    Andere Zielsprachen als Deutsch (mehrsprachiger Modus) nutzen die mehrsprachige System-Anweisung.
+    """
+    masked_text, originals = mask_markup(english_text)
+    language_glossary = glossary_for(language)
+    required_terms = language_glossary.find_terms(masked_text)
+    cached = translation_memory.get(english_text, language)
+    if cached and not Glossary.violations(required_terms, cached):
+        return cached
+    attempts = [(masked_text, originals)]
+    if originals:
+        attempts.append((english_text, []))
+
+    # Hält auch der Einzelmodus das Glossar nicht ein, wird die letzte Übersetzung trotzdem genommen
+    # (mit Warnung, aber ohne sie ins Gedächtnis zu schreiben), statt die Zeile ganz zu verlieren.
+    glossary_fallback = None
+    for text_for_api, attempt_originals in attempts:
+        glossary_lines = Glossary.format_entries(required_terms)
+        if language == TARGET_LANGUAGE:
+            prompt, instruction = single_line_prompt(filename, text_for_api, glossary_lines), TRANSLATION_SYSTEM_INSTRUCTION
+        else:
+            prompt, instruction = locale_single_line_prompt(filename, text_for_api, language, glossary_lines), MULTI_LOCALE_SYSTEM_INSTRUCTION
+        try:
+            response = generate_content(prompt, "single_line", instruction)
+        except Exception as e:
+            print(f"    - 🛑 Fehler bei Einzelanfrage: {e}")
+            failure_reasons[(english_text, language)] = f"API-Fehler: {e}"
+            return glossary_fallback
+        translated_text = unmask_markup(response.strip(), attempt_originals)
+        if translated_text:
+            violations = Glossary.violations(required_terms, translated_text)
+            if not violations:
+                translation_memory.put(english_text, translated_text, language)
+                return translated_text
+            metrics.count("glossary_violations")
+            print(f"    - ⚠️ Glossar nicht eingehalten ({', '.join(target for _, target in violations)} fehlt).")
+            glossary_fallback = translated_text
+            continue
+        print("    - ⚠️ Platzhalter nicht vollständig zurückgekommen, versuche es ohne Maskierung...")
+    if glossary_fallback:
+        metrics.count("glossary_violations_accepted")
+        print("    - ⚠️ Übernehme die Übersetzung trotz fehlender Glossar-Begriffe.")
+    else:
+        failure_reasons[(english_text, language)] = "Platzhalter nicht vollständig zurückgekommen"
+    return glossary_fallback
+
+def failure_record(filepath, entry, original_text, language=TARGET_LANGUAGE):
+    """Eintrag für die Fehler-Warteschlange zu einer endgültig fehlgeschlagenen Zeile."""
+    reason = failure_reasons.get((original_text, language), "Übersetzung fehlgeschlagen")
+    return {"file": filepath, "key": entry.key, "line": entry.line, "language": language, "source": original_text, "reason": reason}
+
+def record_failures(failures, resolved):
+    """Schreibt fehlgeschlagene Zeilen in die Warteschlange und hakt gelungene (Datei, Key)-Paare dort ab."""
+    try:
+        failure_queue.record_many(failures)
+        failure_queue.resolve_many(resolved)
+    except Exception as e:
+        print(f"      - 🛑 Fehler-Warteschlange konnte nicht aktualisiert werden: {e}")
+
+def print_failure_summary():
+    stats = failure_queue.stats()
+    if stats["pending"] or stats["dead"]:
+        print(f"📮 Fehler-Warteschlange: {stats['pending']} Zeilen warten auf einen neuen Versuch "
+              f"(python replay_failures.py), {stats['dead']} nach {FAILURE_MAX_ATTEMPTS} Versuchen aufgegeben (--list).")
+
+def is_pure_variable(value):
+    """Ein Wert wie "$VALUE$", der nur aus einer Variablen besteht und daher nicht übersetzt wird."""
+    return value.startswith('$') and value.endswith('$') and value.count('$') == 2
+
+def collect_entries(document, keys=None):
+    """
+    Sucht alle unübersetzten Einträge eines Dokuments, die Text zum Übersetzen enthalten.
+    Mit `keys` nur unter diesen Keys (z. B. die Einträge der Fehler-Warteschlange).
+    """
+    entries = []
+    for entry in document.entries:
+        if entry.translated or not entry.value: continue
+        if keys is not None and entry.key not in keys: continue
+        if is_pure_variable(entry.value):
+            print(f'  - Überspringe (reine Variable): "{entry.value}"')
+            continue
+        entries.append(entry)
+    return entries
 
+def process_batch(batch):
+    """
+    Worker für die BatchEngine: übersetzt (Kontext, eindeutige Texte, Sprachen).
+    Gibt {Quelltext: {Sprache: Übersetzung}} zurück oder None, wenn ein Batch mit mehreren Texten ganz
+    fehlgeschlagen ist und halbiert werden soll. Nur ein einzelner, weiterhin fehlschlagender Text geht
+    pro fehlender Sprache in den sicheren Einzelmodus.
+    """
+    context, texts, languages = batch
+    print(f"  - Übersetze Batch mit {len(texts)} Texten aus {context} ({', '.join(languages)})...")
+
+    results = translate_batch(texts, languages, context)
+    success = results is not None and all(len(results[text]) == len(languages) for text in texts)
+    batch_budget.record(len(texts), success)
+    metrics.count("batches")
+    if not success:
+        metrics.count("batches_failed" if not results or not any(results.values()) else "batches_partial")
+    if len(texts) > 1:
+        if results and any(results.values()):
+            # Fehlende Text-Sprach-Paare reiht der Aufrufer als kleineren Batch erneut ein.
+            return results
+        print(f"  ⚠️ Batch mit {len(texts)} Texten aus {context} fehlgeschlagen. Wird halbiert...")
+        return None
+    if success:
+        return results
+    text = texts[0]
+    translations = dict((results or {}).get(text, {}))
+    for language in languages:
+        if language in translations:
+            continue
+        print(f"  ⚠️ [{language}] Einzeltext aus {context} fehlgeschlagen. Wechsle zum sicheren Einzelmodus...")
+        metrics.count("single_line_fallbacks")
+        translated_text = translate_single_line_safely(text, context, language)
+        if translated_text:
+            translations[language] = translated_text
+        else:
+            metrics.count("single_line_failed")
+    return {text: translations}
+
+def entry_token_cost(text, languages=1):
+    """
+    Geschätzte Tokens eines Eintrags: Eingabe, erwartete (meist längere) Ausgabe je Zielsprache und JSON-Overhead.
+    """
+    return int(estimate_tokens(text) * (1 + OUTPUT_TOKEN_FACTOR * languages)) + JSON_ENTRY_OVERHEAD_TOKENS * languages
+
+def batch_context(filenames):
+    """Baut aus den Dateinamen eines Batches den Kontext-Hinweis für den Prompt."""
+    context = ", ".join(filenames[:MAX_CONTEXT_FILES])
+    if len(filenames) > MAX_CONTEXT_FILES:
+        context += f" (+{len(filenames) - MAX_CONTEXT_FILES} more)"
+    return context
+
+def pack_batches(unique_texts_by_file, languages=1):
+    """
+    Generator über eine globale Warteschlange aus (Kontext, Texte)-Batches.
+    Ein Batch wird gefüllt, bis das aktuelle Token-Budget oder BATCH_SIZE erreicht ist, und darf
+    Dateigrenzen überschreiten; die Texte bleiben dabei nach Datei gruppiert. Da die Batches erst
+    bei Bedarf gebildet werden, wirkt eine Anpassung des Budgets sofort auf alle folgenden Batches.
+    `languages` ist die Zahl der Zielsprachen, die jede Antwort enthält (mehrsprachiger Modus).
+    """
+    texts, filenames, tokens = [], [], 0
+    for filepath, file_texts in unique_texts_by_file.items():
+        filename = os.path.basename(filepath)
+        for text in file_texts:
+            cost = entry_token_cost(text, languages)
+            if texts and (len(texts) >= BATCH_SIZE or tokens + cost > batch_budget.tokens):
+                yield batch_context(filenames), texts
+                texts, filenames, tokens = [], [], 0
+            if filename not in filenames:
+                filenames.append(filename)
+            texts.append(text)
+            tokens += cost
+    if texts:
+        yield batch_context(filenames), texts
+
+def save_translated_file(filepath, state):
+    """Schreibt eine Datei atomar, falls sie ungespeicherte Übersetzungen enthält. Gibt False bei einem Fehler zurück."""
+    filename = os.path.basename(filepath)
+    if not state["document"].modified:
+        return True
+    print(f"  💾 Speichere übersetzte Datei '{filename}'...")
+    try:
+        with metrics.timed("file_write"):
+            state["document"].save(filepath)
+        return True
+    except Exception as e:
+        print(f"  🛑 Schwerwiegender Fehler bei Datei {filename}: {e}")
+        return False
+
+def apply_journal_entries(document, journal_entries):
+    """
+    Setzt im Journal gesicherte Übersetzungen wieder ein, sofern der Key noch existiert und unübersetzt ist.
+    Gibt die Anzahl wiederhergestellter Einträge zurück.
+    """
+    restored = 0
+    for key, text in journal_entries.items():
+        entry = document.index.get(key)
+        if entry is not None and not entry.translated:
+            document.set_translation(entry, text)
+            restored += 1
+    return restored
+
+def load_documents(main_folder):
+    """Liest alle `_german.yml`-Dateien eines Ordners ein. Gibt {Dateipfad: LocDocument} zurück."""
+    documents = {}
     for root, _, files in os.walk(main_folder):
         for filename in files:
             if filename.endswith("_german.yml"):
                 filepath = os.path.join(root, filename)
-                print(f"\n🔄 Bearbeite Datei: {filepath}")
-
                 try:
-                    with open(filepath, 'r', encoding='utf-8-sig') as f: lines = f.readlines()
-                    new_lines, batch_to_translate, needs_update = list(lines), [], False
-
-                    for i, line in enumerate(lines):
-                        if TRANSLATION_MARKER in line: continue
-
-                        match = line_pattern.match(line.rstrip())
-                        if match:
-                            key_part = match.group(1)
-                            value = match.group(2)
-                            original_comment = match.group(3) if match.group(3) else ""
-
-                            if value and value != '""':
-                                if value.startswith('"$') and value.endswith('$"') and value.count('$') == 2:
-                                    print(f"  - Überspringe (reine Variable): {value}")
-                                    continue
-                                text_for_api = value.strip('"').replace('""', '"')
-                                batch_to_translate.append((i, text_for_api, key_part, original_comment))
-
-                        if (len(batch_to_translate) >= BATCH_SIZE) or (i == len(lines) - 1 and batch_to_translate):
-                            if not batch_to_translate: continue
-                            start_line, end_line = batch_to_translate[0][0] + 1, batch_to_translate[-1][0] + 1
-                            print(f"  - Übersetze Batch (Zeilen {start_line}-{end_line}) aus '{filename}'...")
-                            
-                            original_texts = [item[1] for item in batch_to_translate]
-                            translated_texts = translate_batch_with_gemini(original_texts, filename)
-                            
-                            if translated_texts:
-                                for idx, (line_index, _, key_part, original_comment) in enumerate(batch_to_translate):
-                                    translated_text = translated_texts[idx]
-                                    processed_translation = translated_text.replace('"', '""').replace('\n', '\\n')
-                                    new_line = f'{key_part.rstrip()} "{processed_translation}"{original_comment}  {TRANSLATION_MARKER}\n'
-                                    new_lines[line_index] = new_line
-                                needs_update = True
-                            else:
-                                print("  ⚠️ Batch fehlgeschlagen. Wechsle zum sicheren Einzelmodus...")
-                                for line_index, original_text, key_part, original_comment in batch_to_translate:
-                                    print(f"    - Einzelversuch für Zeile {line_index + 1}...")
-                                    translated_text = translate_single_line_safely(original_text, filename)
-                                    if translated_text:
-                                        processed_translation = translated_text.replace('"', '""').replace('\n', '\\n')
-                                        new_line = f'{key_part.rstrip()} "{processed_translation}"{original_comment}  {TRANSLATION_MARKER}\n'
-                                        new_lines[line_index] = new_line
-                                        needs_update = True
-                                    else:
-                                        print(f"    - 🛑 Einzelversuch fehlgeschlagen. Wird geloggt.")
-                                        try:
-                                            with open(ERROR_LOG_FILE, 'a', encoding='utf-8') as f:
-                                                f.write(f"Datei: {filename}, Zeile: {line_index + 1}, Text: {original_text}\n")
-                                        except Exception as e_log:
-                                            print(f"      - 🛑 In Log-Datei schreiben fehlgeschlagen: {e_log}")
-                                    time.sleep(1)
-                            batch_to_translate = []
-                            time.sleep(1)
-
-                    if needs_update:
-                        print(f"  💾 Speichere übersetzte Datei...")
-                        with open(filepath, 'w', encoding='utf-8-sig') as f: f.writelines(new_lines)
-                    else:
-                        print("  ✅ Datei bereits vollständig übersetzt oder enthält nur reine Variablen.")
+                    with metrics.timed("file_read"):
+                        documents[filepath] = LocDocument.load(filepath)
                 except Exception as e:
                     print(f"  🛑 Schwerwiegender Fehler bei Datei {filename}: {e}")
+    return documents
+
+def api_key_missing():
+    return get_backend().requires_api_key and (not GEMINI_API_KEY or GEMINI_API_KEY == "DEIN_GEMINI_API_KEY")
+
+def translate_documents(documents_by_language, save_files=True, only_keys=None):
+    """
+    Übersetzt die offenen Einträge bereits geladener Dokumente ({Sprache: {Dateipfad: LocDocument}}) im Speicher;
+    für Deutsch allein also {"german": {...}}. Mit save_files=False (Pipeline) schreibt der Aufrufer die Dateien,
+    mit only_keys ({Dateipfad: Keys}) werden nur diese Einträge übersetzt. Gibt False bei einem Fehler zurück.
+    """
+    if api_key_missing():
+        print("🛑 FEHLER: Bitte füge deinen Gemini API Key in das Skript ein.")
+        return False
+
+    languages = list(documents_by_language)
+    if len(glossary) and TARGET_LANGUAGE in languages:
+        print(f"📖 Glossar '{GLOSSARY_FILE}' mit {len(glossary)} Einträgen geladen (nur für {TARGET_LANGUAGE}).")
 
+    removed = translation_memory.invalidate()
+    if removed:
+        print(f"🧹 {removed} Einträge einer älteren Prompt-Version aus dem Übersetzungsgedächtnis entfernt.")
+
+    # Nach einem Abbruch: bereits bezahlte Batches aus dem Journal wiederherstellen.
+    journal_entries = journal.replay()
+    if journal_entries:
+        print(f"♻️ Journal aus einem abgebrochenen Lauf gefunden ({sum(len(e) for e in journal_entries.values())} Zeilen), spiele es ein...")
+
+    saved_files = []
+
+    def save(filepath, state):
+        if not save_files:
+            return True
+        saved = save_translated_file(filepath, state)
+        if saved:
+            saved_files.append(filepath)
+        return saved
+
+    # Schritt 1: Jeden Quelltext mit all seinen Fundstellen im Baum erfassen.
+    # occurrences: Quelltext -> {Sprache: [(Dateipfad, LocEntry), ...]}
+    # first_file: Die Datei, in der ein Text zuerst auftaucht, liefert den Kontext für den Prompt.
+    file_states, occurrences, first_file = {}, {}, {}
+    batches_without_dedup = 0
+    all_saved = True
+    for language, documents in documents_by_language.items():
+        for filepath, document in documents.items():
+            print(f"\n🔄 Prüfe Datei: {filepath}")
+            restored = apply_journal_entries(document, journal_entries.get(os.path.abspath(filepath), {}))
+            if restored:
+                print(f"  ♻️ {restored} Zeilen aus dem Journal wiederhergestellt.")
+
+            entries = collect_entries(document, only_keys.get(filepath, ()) if only_keys is not None else None)
+            state = {"document": document, "open_entries": len(entries)}
+            if not entries:
+                all_saved &= save(filepath, state)
+                print("  ✅ Datei bereits vollständig übersetzt oder enthält nur reine Variablen.")
+                continue
+            file_states[filepath] = state
+            # Vergleichswert: jede Datei für sich gepackt, ohne Deduplizierung, beim anfänglichen Token-Budget.
+            batches_without_dedup += sum(1 for _ in pack_batches({filepath: [entry.text for entry in entries]}))
+            for entry in entries:
+                text = entry.text
+                first_file.setdefault(text, filepath)
+                occurrences.setdefault(text, {}).setdefault(language, []).append((filepath, entry))
+
+    # Texte nach den Sprachen gruppieren, in denen sie fehlen: ein Batch fragt alle Texte in denselben Sprachen an.
+    groups = {}
+    for text, sites in occurrences.items():
+        text_languages = tuple(language for language in languages if language in sites)
+        groups.setdefault(text_languages, {}).setdefault(first_file[text], []).append(text)
+    pairs = sum(len(sites) for sites in occurrences.values())
+    total_entries = sum(len(entries) for sites in occurrences.values() for entries in sites.values())
+    if total_entries:
+        dedup_ratio = (1 - pairs / total_entries) * 100
+        print(f"\n🧮 {total_entries} offene Zeilen in {len(languages)} Sprache(n), davon {len(occurrences)} eindeutige Texte "
+              f"({pairs} Text-Sprach-Paare, {dedup_ratio:.1f}% Duplikate).")
+    metrics.start_progress(total_entries)
+
+    # Geplante Batches nach Deduplizierung und Packen, beim selben Token-Budget wie der Vergleichswert.
+    planned_batches = sum(1 for text_languages, texts_by_file in groups.items()
+                          for _ in pack_batches(texts_by_file, len(text_languages)))
+    packed_batches = 0
+
+    def jobs():
+        nonlocal packed_batches
+        for text_languages, texts_by_file in groups.items():
+            for context, texts in pack_batches(texts_by_file, len(text_languages)):
+                packed_batches += 1
+                yield context, texts, text_languages
+
+    # Schritt 2: Jeden eindeutigen Text nur einmal und über Dateigrenzen hinweg in Batches packen, parallel
+    # übersetzen und jedes Ergebnis an alle Fundstellen verteilen. Fehlgeschlagene Batches werden halbiert
+    # und erneut eingereiht. Jede Datei wird gespeichert, sobald ihre letzte offene Zeile abgearbeitet ist.
+    print(f"\n🚀 Übersetze Texte aus {len(file_states)} Dateien in {', '.join(languages)}, bis zu {MAX_CONCURRENT_REQUESTS} Batches gleichzeitig...")
+    engine = BatchEngine(MAX_CONCURRENT_REQUESTS)
+    batch_requests = 0
+    per_language = {language: {"translated": 0, "failed": 0} for language in languages}
+    last_flush = last_progress = time.monotonic()
+    for (context, texts, text_languages), results in engine.run(jobs(), process_batch):
+        batch_requests += 1
+        if results is None and len(texts) > 1:
+            metrics.count("batches_split")
+            middle = len(texts) // 2
+            engine.submit((context, texts[:middle], text_languages))
+            engine.submit((context, texts[middle:], text_languages))
+            continue
+
+        # Fehlende Text-Sprach-Paare eines größeren Batches erneut einreihen, gruppiert nach den fehlenden Sprachen.
+        results = results or {}
+        requeued = {}
+        if len(texts) > 1:
+            for text in texts:
+                failed_languages = tuple(language for language in text_languages if not results.get(text, {}).get(language))
+                if failed_languages:
+                    requeued.setdefault(failed_languages, []).append(text)
+            for failed_languages, failed_texts in requeued.items():
+                engine.submit((context, failed_texts, failed_languages))
+        requeued_pairs = {(text, language) for failed_languages, failed_texts in requeued.items()
+                          for text in failed_texts for language in failed_languages}
+        finished = [(text, language) for text in texts for language in text_languages if (text, language) not in requeued_pairs]
+
+        # Erst ins Journal, dann in den Speicher: ein Absturz verliert so höchstens die laufenden Batches.
+        journal.append([
+            {"file": filepath, "line": entry.line, "key": entry.key, "text": results[text][language]}
+            for text, language in finished if results.get(text, {}).get(language)
+            for filepath, entry in occurrences[text][language]
+        ])
+        failures, resolved = [], []
+        for text, language in finished:
+            translated_text = results.get(text, {}).get(language)
+            for filepath, entry in occurrences[text][language]:
+                state = file_states[filepath]
+                if translated_text:
+                    state["document"].set_translation(entry, translated_text)
+                    resolved.append((filepath, entry.key))
+                    metrics.count("lines_translated")
+                    per_language[language]["translated"] += 1
+                else:
+                    filename = os.path.basename(filepath)
+                    print(f"    - 🛑 Zeile {entry.line + 1} in '{filename}' fehlgeschlagen. Kommt in die Fehler-Warteschlange.")
+                    failures.append(failure_record(filepath, entry, text, language))
+                    metrics.count("lines_failed")
+                    per_language[language]["failed"] += 1
+                metrics.advance()
+
+                state["open_entries"] -= 1
+                if state["open_entries"] == 0:
+                    all_saved &= save(filepath, state)
+                    del file_states[filepath]
+
+        record_failures(failures, resolved)
+
+        if time.monotonic() - last_progress >= PROGRESS_SECONDS:
+            print(f"  {metrics.progress_line()}")
+            last_progress = time.monotonic()
+
+        # Regelmäßig auch halb fertige Dateien sichern; die Journal-Einträge gespeicherter Dateien sind danach überflüssig.
+        if save_files and time.monotonic() - last_flush >= JOURNAL_FLUSH_SECONDS:
+            for filepath, state in file_states.items():
+                all_saved &= save(filepath, state)
+            journal.discard(saved_files)
+            last_flush = time.monotonic()
+
+    # Nur die Journal-Einträge gespeicherter Dateien verwerfen; Einträge anderer Dateien bleiben erhalten.
+    if save_files:
+        journal.discard(saved_files)
+
+    stats = translation_memory.stats()
     print("\n\n✨ Übersetzungsprozess abgeschlossen.")
-    if os.path.exists(ERROR_LOG_FILE):
-        print(f"Einige Fehler wurden in '{ERROR_LOG_FILE}' protokolliert.")
+    metrics.count("batches_planned", planned_batches)
+    print(f"📦 {planned_batches} Batches nach Deduplizierung und Packen statt {batches_without_dedup} Datei für Datei (beim anfänglichen Token-Budget).")
+    print(f"   Gesendet: {batch_requests} Batch-Anfragen, davon {batch_requests - packed_batches} Wiederholungen (halbiert oder erneut "
+          f"eingereiht), dazu {metrics.counters.get('single_line_fallbacks', 0)} Einzelanfragen nach Fehlern.")
+    if len(languages) > 1:
+        for language, counts in per_language.items():
+            print(f"   {language}: {counts['translated']} Zeilen übersetzt, {counts['failed']} fehlgeschlagen.")
+    print(f"📏 Token-Budget pro Batch am Ende: {batch_budget.tokens}. Erfolgsquote nach Batch-Größe:")
+    for size_range, attempts, success_rate in batch_budget.report():
+        print(f"   {size_range:>7} Einträge: {attempts} Batches, {success_rate:.0f}% erfolgreich")
+    print(f"📚 Übersetzungsgedächtnis: {stats['hits']} Treffer, {stats['misses']} nicht gefunden ({stats['hit_rate']:.1f}% Trefferquote).")
+    print_time_breakdown()
+    print_failure_summary()
+    return all_saved
+
+def print_time_breakdown():
+    """Zeigt, wohin die Zeit gegangen ist: API-Aufrufe, Warten auf die Quota, Einzelmodus und Datei-I/O."""
+    report = metrics.report()
+    latency = report["latency"]
+    api_seconds = sum(summary["sum_seconds"] for operation, summary in latency.items() if operation.startswith("api_"))
+
+    def seconds(operation):
+        return latency.get(operation, {}).get("sum_seconds", 0.0)
+
+    print(f"⏱️ {report['lines']['per_second']:.1f} Zeilen/s. Summierte Zeit über alle Threads: API {api_seconds:.1f}s, "
+          f"Warten auf Quota {seconds('quota_wait'):.1f}s, Einzelmodus {seconds('translate_single_line'):.1f}s, "
+          f"Lesen {seconds('file_read'):.1f}s, Schreiben {seconds('file_write'):.1f}s.")
+    per_line = report["input_tokens_per_line"]
+    print(f"🧾 Eingabe-Tokens pro übersetzter Zeile: {per_line['excluding_instruction']:.1f} ohne System-Anweisung, "
+          f"{per_line['including_instruction']:.1f} mit ihr, abgerechnet {per_line['billed']:.1f}.")
+    print(f"   Tokens: {report['tokens']['prompt']} Prompt, {report['tokens']['response']} Antwort. "
+          f"Batch-Fehlerquote {report['rates']['batch_failure']:.0%}, Einzelmodus-Quote {report['rates']['single_line_fallback']:.0%}.")
+
+def translate_lotr_files(main_folder):
+    """Die Hauptfunktion des Skripts."""
+    print(f"--- Starte Batch-Übersetzungsprozess in: '{main_folder}' ---")
+    translate_documents({TARGET_LANGUAGE: load_documents(main_folder)})
+    write_metrics_report()
 
 if __name__ == '__main__':
     if not folder_to_translate or not os.path.isdir(folder_to_translate):
@@ -0,0 +1,185 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+
+from translation_engine import estimate_tokens
+
+
+class TranslationBackend:
+    """
+    Schnittstelle für alle Übersetzungs-Anbieter. Unterklassen implementieren `_generate(prompt, system_instruction)`
+    und liefern (Antworttext, Prompt-Tokens, Antwort-Tokens); `generate()` zählt Anfragen und Tokens mit.
+    `system_instruction` enthält die festen Regeln getrennt vom wechselnden Teil der Anfrage.
+    """
+
+    name = "base"
+    requires_api_key = False
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self._lock = threading.Lock()
+
+    def _generate(self, prompt, system_instruction=None):
+        raise NotImplementedError
+
+    def generate_with_usage(self, prompt, system_instruction=None):
+        """Schickt einen Prompt an das Modell und gibt (Antworttext, Prompt-Tokens, Antwort-Tokens) zurück."""
+        text, prompt_tokens, response_tokens = self._generate(prompt, system_instruction)
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.response_tokens += response_tokens
+        return text, prompt_tokens, response_tokens
+
+    def generate(self, prompt, system_instruction=None):
+        """Schickt einen Prompt an das Modell und gibt die Antwort als Text zurück."""
+        return self.generate_with_usage(prompt, system_instruction)[0]
+
+    def stats(self):
+        return {"requests": self.requests, "prompt_tokens": self.prompt_tokens, "response_tokens": self.response_tokens}
+
+
+class GeminiBackend(TranslationBackend):
+    """
+    Google Gemini über `google-generativeai`. Die Bibliothek wird erst beim Erzeugen importiert.
+    Pro System-Anweisung wird einmal ein Modell angelegt und für alle weiteren Anfragen wiederverwendet;
+    die Anweisung selbst schickt die Bibliothek mit jeder Anfrage mit, sie wird also jedes Mal abgerechnet.
+    """
+
+    name = "gemini"
+    requires_api_key = True
+
+    def __init__(self, api_key, model_name='gemini-1.5-flash'):
+        super().__init__()
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self._model_name = model_name
+        self._models = {}
+
+    def _model(self, system_instruction):
+        with self._lock:
+            if system_instruction not in self._models:
+                self._models[system_instruction] = self._genai.GenerativeModel(self._model_name, system_instruction=system_instruction)
+            return self._models[system_instruction]
+
+    def _generate(self, prompt, system_instruction=None):
+        response = self._model(system_instruction).generate_content(prompt)
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", 0) or estimate_tokens(prompt)
+        response_tokens = getattr(usage, "candidates_token_count", 0) or estimate_tokens(response.text)
+        return response.text, prompt_tokens, response_tokens
+
+
+class StubBackend(TranslationBackend):
+    """
+    Deterministisches Offline-Backend für Tests und Benchmarks – ohne Netzwerk und ohne API-Key.
+    Erkennt die Prompts der Skripte und antwortet mit einer markierten Pseudo-Übersetzung, die
+    Platzhalter und Markup unverändert lässt und die Begriffe aus einem mitgeschickten Glossar einsetzt.
+    Latenz, Fehlerquote und Quote kaputter JSON-Antworten sind einstellbar; ob ein Prompt scheitert,
+    hängt nur von `seed` und dem Prompt selbst ab.
+    """
+
+    name = "stub"
+    JSON_PAYLOAD_PATTERN = re.compile(r"JSON array to translate:\s*(\[.*\])", re.S)
+    SINGLE_LINE_PATTERN = re.compile(r'English text: "(.*)"\s*---', re.S)
+    ARTICLE_PHRASE_PATTERN = re.compile(r'Phrase to correct:\s*"(.*)"', re.S)
+    ARTICLE_BATCH_PATTERN = re.compile(r"JSON array:\s*(\[.*\])", re.S)
+    GLOSSARY_ENTRY_PATTERN = re.compile(r"^- (.+?) → (.+)$", re.M)
+    TARGET_LANGUAGES_PATTERN = re.compile(r"^\*\*TARGET LANGUAGES:\*\* (.+)$", re.M)
+
+    def __init__(self, latency=0.0, failure_rate=0.0, malformed_rate=0.0, seed=0, prefix="[DE] "):
+        super().__init__()
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.malformed_rate = malformed_rate
+        self.seed = seed
+        self.prefix = prefix
+
+    def _pseudo_translate(self, text, glossary_entries, language="german"):
+        # Das Glossar enthält deutsche Begriffe; andere Sprachen bekommen nur ihr eigenes Kürzel, z. B. '[FR] '.
+        if language != "german":
+            return f"[{language[:2].upper()}] {text}"
+        for source, target in glossary_entries:
+            text = re.sub(re.escape(source), lambda _: target, text, flags=re.I)
+        return self.prefix + text
+
+    def _answer(self, prompt):
+        glossary_entries = self.GLOSSARY_ENTRY_PATTERN.findall(prompt)
+        target_languages = self.TARGET_LANGUAGES_PATTERN.search(prompt)
+        languages = [language.strip() for language in target_languages.group(1).split(",")] if target_languages else None
+        payload = self.JSON_PAYLOAD_PATTERN.search(prompt)
+        if payload:
+            texts = json.loads(payload.group(1))
+            if languages:
+                return json.dumps([{language: self._pseudo_translate(text, glossary_entries, language) for language in languages}
+                                   for text in texts], ensure_ascii=False)
+            return json.dumps([self._pseudo_translate(text, glossary_entries) for text in texts], ensure_ascii=False)
+        article_batch = self.ARTICLE_BATCH_PATTERN.search(prompt)
+        if article_batch:
+            return json.dumps({item["id"]: "der" for item in json.loads(article_batch.group(1))})
+        single_line = self.SINGLE_LINE_PATTERN.search(prompt)
+        if single_line:
+            return self._pseudo_translate(single_line.group(1), glossary_entries, languages[0] if languages else "german")
+        phrase = self.ARTICLE_PHRASE_PATTERN.search(prompt)
+        if phrase:
+            return phrase.group(1).replace("$the_$", "der")
+        return "der"
+
+    def _generate(self, prompt, system_instruction=None):
+        rng = random.Random(self.seed ^ zlib.crc32(prompt.encode("utf-8")))
+        if self.latency:
+            time.sleep(self.latency)
+        if rng.random() < self.failure_rate:
+            raise RuntimeError("Stub-Backend: simulierter API-Fehler")
+        answer = self._answer(prompt)
+        if rng.random() < self.malformed_rate:
+            answer = answer[: len(answer) // 2]
+        # Wie bei Gemini zählt die System-Anweisung zu den Prompt-Tokens jeder Anfrage.
+        prompt_tokens = estimate_tokens(prompt) + (estimate_tokens(system_instruction) if system_instruction else 0)
+        return answer, prompt_tokens, estimate_tokens(answer)
+
+
+def create_backend(name=None):
+    """
+    Erzeugt das Backend aus der Umgebung: TRANSLATION_BACKEND=gemini (Standard) oder stub.
+    Gemini liest GEMINI_MODEL, der Stub STUB_LATENCY, STUB_FAILURE_RATE, STUB_MALFORMED_RATE und STUB_SEED.
+    """
+    name = (name or os.getenv("TRANSLATION_BACKEND", "gemini")).lower()
+    if name == "gemini":
+        return GeminiBackend(os.getenv("GEMINI_API_KEY"), os.getenv("GEMINI_MODEL", "gemini-1.5-flash"))
+    if name == "stub":
+        return StubBackend(
+            latency=float(os.getenv("STUB_LATENCY", "0")),
+            failure_rate=float(os.getenv("STUB_FAILURE_RATE", "0")),
+            malformed_rate=float(os.getenv("STUB_MALFORMED_RATE", "0")),
+            seed=int(os.getenv("STUB_SEED", "0")),
+        )
+    raise ValueError(f"Unbekanntes Übersetzungs-Backend: {name}")
+
+
+_active_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Gibt das für diesen Lauf aktive Backend zurück und erzeugt es bei der ersten Nutzung."""
+    global _active_backend
+    with _backend_lock:
+        if _active_backend is None:
+            _active_backend = create_backend()
+        return _active_backend
+
+
+def set_backend(backend):
+    """Setzt das aktive Backend, z. B. einen StubBackend für Tests und Benchmarks."""
+    global _active_backend
+    with _backend_lock:
+        _active_backend = backend
@@ -0,0 +1,195 @@
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# --- Standardwerte für Drosselung und Backoff ---
+RATE_WINDOW_SECONDS = 60.0
+MAX_RATE_LIMIT_RETRIES = 6
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 64.0
+# "429" nur als eigene Zahl, nicht z. B. als Teil einer ID oder Tokenzahl in der Fehlermeldung
+RATE_LIMIT_STATUS_PATTERN = re.compile(r"\b429\b")
+
+
+def estimate_tokens(text):
+    """Grobe Token-Schätzung (ca. 4 Zeichen pro Token), reicht für die TPM-Drosselung."""
+    return max(1, len(text) // 4)
+
+
+def is_rate_limit_error(error):
+    """Erkennt 429-/Quota-Fehler, ohne von einer bestimmten Client-Bibliothek abzuhängen."""
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests", "RateLimitError"):
+        return True
+    message = str(error)
+    return bool(RATE_LIMIT_STATUS_PATTERN.search(message)) or "quota" in message.lower()
+
+
+class RateLimiter:
+    """
+    Gleitendes 60-Sekunden-Fenster für Anfragen pro Minute (RPM) und Tokens pro Minute (TPM).
+    Wird von allen Worker-Threads gemeinsam genutzt; ein Wert von 0 schaltet das jeweilige Limit ab.
+    """
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0, clock=time.monotonic, sleep=time.sleep):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._clock = clock
+        self._sleep = sleep
+        self._events = deque()  # (Zeitstempel, Tokens)
+        self._tokens_in_window = 0
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._events and self._events[0][0] <= now - RATE_WINDOW_SECONDS:
+            _, tokens = self._events.popleft()
+            self._tokens_in_window -= tokens
+
+    def _wait_time(self, now, tokens):
+        if self._paused_until > now:
+            return self._paused_until - now
+        if self.requests_per_minute and len(self._events) >= self.requests_per_minute:
+            return self._events[0][0] + RATE_WINDOW_SECONDS - now
+        if self.tokens_per_minute and self._events and self._tokens_in_window + tokens > self.tokens_per_minute:
+            # Warten, bis genug alte Anfragen aus dem Fenster gefallen sind
+            freed = 0
+            for timestamp, event_tokens in self._events:
+                freed += event_tokens
+                if self._tokens_in_window - freed + tokens <= self.tokens_per_minute:
+                    return timestamp + RATE_WINDOW_SECONDS - now
+            # Die Anfrage allein übersteigt schon das TPM-Limit: sie geht erst bei leerem Fenster raus.
+            return self._events[-1][0] + RATE_WINDOW_SECONDS - now
+        return 0.0
+
+    def acquire(self, tokens=1):
+        """Blockiert, bis eine Anfrage mit der geschätzten Tokenzahl ins Budget passt."""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._expire(now)
+                delay = self._wait_time(now, tokens)
+                if delay <= 0:
+                    self._events.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return
+            self._sleep(min(delay, RATE_WINDOW_SECONDS))
+
+    def pause(self, seconds):
+        """Hält nach einem 429-Fehler alle Threads gemeinsam für `seconds` Sekunden an."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+def call_with_backoff(request_fn, limiter=None, tokens=1, max_retries=MAX_RATE_LIMIT_RETRIES):
+    """
+    Führt `request_fn` gedrosselt aus. Bei 429-Fehlern wird exponentiell (mit Jitter) gewartet
+    und erneut versucht; alle anderen Fehler werden unverändert weitergereicht.
+    """
+    for attempt in range(max_retries + 1):
+        if limiter:
+            limiter.acquire(tokens)
+        try:
+            return request_fn()
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt == max_retries:
+                raise
+            delay = min(BACKOFF_BASE_SECONDS * (2 ** attempt), BACKOFF_MAX_SECONDS)
+            delay += random.uniform(0, delay / 4)
+            print(f"    - ⏳ Rate-Limit erreicht, warte {delay:.1f}s (Versuch {attempt + 1}/{max_retries})...")
+            if limiter:
+                limiter.pause(delay)
+            else:
+                time.sleep(delay)
+
+
+class AdaptiveBatchBudget:
+    """
+    Token-Budget pro Batch (Eingabe plus erwartete Ausgabe), das sich an der Erfolgsquote anpasst:
+    Häufen sich fehlgeschlagene Batches, wird es verkleinert, bei durchgehendem Erfolg wieder vergrößert.
+    Die Erfolgsquote wird zusätzlich pro Batch-Größe (Anzahl Einträge, in Zweierpotenzen) protokolliert.
+    """
+
+    def __init__(self, initial_tokens, min_tokens, max_tokens, window=10):
+        self.tokens = initial_tokens
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.window = window
+        self._recent = deque(maxlen=window)
+        self._stats = {}  # Bucket -> [Versuche, Erfolge]
+        self._lock = threading.Lock()
+
+    def record(self, entries, success):
+        with self._lock:
+            bucket = max(1, entries).bit_length()
+            stats = self._stats.setdefault(bucket, [0, 0])
+            stats[0] += 1
+            stats[1] += int(success)
+
+            self._recent.append(success)
+            if len(self._recent) < self.window // 2:
+                return
+            success_rate = sum(self._recent) / len(self._recent)
+            if success_rate < 0.8:
+                self.tokens = max(self.min_tokens, int(self.tokens * 0.75))
+                self._recent.clear()
+            elif success_rate == 1.0 and len(self._recent) == self.window:
+                self.tokens = min(self.max_tokens, int(self.tokens * 1.25))
+                self._recent.clear()
+
+    def report(self):
+        """Gibt [(Größenbereich, Versuche, Erfolgsquote in %), ...] sortiert nach Batch-Größe zurück."""
+        rows = []
+        for bucket in sorted(self._stats):
+            attempts, successes = self._stats[bucket]
+            low, high = 2 ** (bucket - 1), 2 ** bucket - 1
+            label = str(low) if low == high else f"{low}-{high}"
+            rows.append((label, attempts, successes / attempts * 100))
+        return rows
+
+
+class BatchEngine:
+    """
+    Hält bis zu `max_workers` Batches gleichzeitig in Bearbeitung.
+    `run()` liefert (job, ergebnis) in Fertigstellungsreihenfolge. Jobs werden erst bei Bedarf aus
+    `jobs` gezogen (es darf also ein Generator sein); über `submit()` eingereihte Jobs, etwa die
+    Hälften eines fehlgeschlagenen Batches, haben Vorrang.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max(1, max_workers)
+        self._pending = deque()
+
+    def submit(self, job):
+        self._pending.append(job)
+
+    def _next_job(self, source):
+        if self._pending:
+            return self._pending.popleft()
+        return next(source, None)
+
+    def run(self, jobs, worker):
+        source = iter(jobs)
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                while len(in_flight) < self.max_workers:
+                    job = self._next_job(source)
+                    if job is None:
+                        break
+                    in_flight[executor.submit(worker, job)] = job
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"  🛑 Unerwarteter Fehler im Worker: {e}")
+                        result = None
+                    yield job, result
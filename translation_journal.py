@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+
+
+def atomic_write_lines(filepath, lines, encoding='utf-8-sig', newline=None):
+    """
+    Schreibt eine Datei über eine temporäre Datei im selben Ordner und ersetzt das Original erst,
+    wenn alles auf der Platte ist. Ein Absturz hinterlässt so nie eine halb geschriebene .yml.
+    """
+    directory = os.path.dirname(os.path.abspath(filepath))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(filepath)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding, newline=newline) as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, filepath)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class TranslationJournal:
+    """
+    Append-only-Journal (JSON Lines) aller fertig übersetzten Zeilen.
+    Jeder abgeschlossene Batch wird sofort angehängt und auf die Platte gezwungen; nach einem Absturz
+    spielt `replay()` die Übersetzungen wieder ein, die noch nicht in den .yml-Dateien gelandet sind.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def append(self, records):
+        """Hängt eine Liste von {"file", "line", "key", "text"}-Einträgen an (`text` ist die fertige Übersetzung)."""
+        if not records:
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _records(self):
+        """Liefert (Rohzeile, Eintrag) für jede lesbare Zeile; eine abgeschnittene letzte Zeile wird übersprungen."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for raw_line in f:
+                try:
+                    yield raw_line, json.loads(raw_line)
+                except json.JSONDecodeError:
+                    continue
+
+    def replay(self):
+        """
+        Gibt {absoluter Dateipfad: {Key: Übersetzung}} zurück. Die Pfade sind absolut, damit ein Eintrag
+        unabhängig davon gefunden wird, ob der Ordner relativ oder absolut angegeben wurde.
+        """
+        entries = {}
+        for _, record in self._records():
+            entries.setdefault(os.path.abspath(record["file"]), {})[record["key"]] = record["text"]
+        return entries
+
+    def discard(self, filepaths):
+        """
+        Entfernt die Einträge der angegebenen Dateien, sobald diese gespeichert sind. Einträge aller anderen
+        Dateien (z. B. außerhalb von --only oder nicht geladen) bleiben für einen späteren Lauf erhalten.
+        """
+        done = {os.path.abspath(filepath) for filepath in filepaths}
+        if not done or not os.path.exists(self.path):
+            return
+        kept = [raw_line if raw_line.endswith("\n") else raw_line + "\n"
+                for raw_line, record in self._records() if os.path.abspath(record["file"]) not in done]
+        if kept:
+            atomic_write_lines(self.path, kept, encoding='utf-8')
+        else:
+            os.remove(self.path)
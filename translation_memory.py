@@ -0,0 +1,225 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from urllib.request import pathname2url
+
+
+class TranslationMemory:
+    """
+    Persistentes Übersetzungsgedächtnis auf SQLite-Basis.
+    Schlüssel ist ein Hash aus Quelltext, Zielsprache und Prompt-Version, damit eine
+    Änderung am Prompt automatisch zu neuen Übersetzungen führt.
+    """
+
+    def __init__(self, path, prompt_version, max_entries=200000):
+        self.path = path
+        self.prompt_version = prompt_version
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # Verbindung erst bei der ersten Nutzung öffnen; sie wird von allen Worker-Threads geteilt.
+        # Die Zeilenzahl wird nur hier gezählt und danach bei jedem Einfügen und Löschen mitgeführt.
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS translations (
+                    cache_key TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    target_lang TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    translation TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations (last_used)")
+            self._conn.commit()
+            self._count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        return self._conn
+
+    def cache_key(self, source, target_lang):
+        raw = f"{self.prompt_version}\x00{target_lang}\x00{source}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _select(conn, keys):
+        """Liest {Quelltext: Übersetzung} zu {Cache-Key: Quelltext}."""
+        found = {}
+        key_list = list(keys)
+        # SQLite erlaubt nur eine begrenzte Anzahl an Parametern pro Abfrage
+        for start in range(0, len(key_list), 500):
+            chunk = key_list[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT cache_key, translation FROM translations WHERE cache_key IN ({placeholders})", chunk
+            ).fetchall()
+            for cache_key, translation in rows:
+                found[keys[cache_key]] = translation
+        return found
+
+    def get_many(self, sources, target_lang):
+        """Gibt {Quelltext: Übersetzung} für alle bereits bekannten Texte zurück."""
+        keys = {self.cache_key(source, target_lang): source for source in set(sources)}
+        with self._lock:
+            conn = self._connection()
+            found = self._select(conn, keys)
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE translations SET last_used = ? WHERE cache_key = ?",
+                    [(now, self.cache_key(source, target_lang)) for source in found],
+                )
+                conn.commit()
+            for source in sources:
+                if source in found:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def get(self, source, target_lang):
+        return self.get_many([source], target_lang).get(source)
+
+    def peek_many(self, sources, target_lang):
+        """
+        Wie `get_many`, aber nur lesend (für Trockenläufe): legt keine Datenbank an, ändert `last_used` nicht
+        und zählt weder Treffer noch Fehlschläge.
+        """
+        keys = {self.cache_key(source, target_lang): source for source in set(sources)}
+        with self._lock:
+            if self._conn is not None:
+                return self._select(self._conn, keys)
+        if not os.path.exists(self.path):
+            return {}
+        conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(self.path))}?mode=ro", uri=True)
+        try:
+            return self._select(conn, keys)
+        except sqlite3.OperationalError:
+            # Datei ohne Tabelle `translations`, z. B. nur mit dem Artikel-Lexikon
+            return {}
+        finally:
+            conn.close()
+
+    def put_many(self, pairs, target_lang):
+        """Speichert eine Liste von (Quelltext, Übersetzung) und räumt bei Bedarf alte Einträge ab."""
+        now = time.time()
+        rows = {
+            self.cache_key(source, target_lang): (source, target_lang, str(self.prompt_version), translation, now)
+            for source, translation in pairs if translation
+        }
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connection()
+            key_list = list(rows)
+            existing = 0
+            for start in range(0, len(key_list), 500):
+                chunk = key_list[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                existing += conn.execute(
+                    f"SELECT COUNT(*) FROM translations WHERE cache_key IN ({placeholders})", chunk
+                ).fetchone()[0]
+            conn.executemany(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?)",
+                [(cache_key, *row) for cache_key, row in rows.items()],
+            )
+            self._count += len(rows) - existing
+            self._evict(conn)
+            conn.commit()
+
+    def put(self, source, translation, target_lang):
+        self.put_many([(source, translation)], target_lang)
+
+    def _evict(self, conn):
+        overflow = self._count - self.max_entries
+        if overflow > 0:
+            cursor = conn.execute(
+                "DELETE FROM translations WHERE cache_key IN "
+                "(SELECT cache_key FROM translations ORDER BY last_used ASC LIMIT ?)", (overflow,)
+            )
+            self._count -= cursor.rowcount
+
+    def invalidate(self, keep_current=True):
+        """
+        Löscht Einträge älterer Prompt-Versionen (oder mit keep_current=False alle Einträge).
+        Gibt die Anzahl der gelöschten Einträge zurück.
+        """
+        with self._lock:
+            conn = self._connection()
+            if keep_current:
+                cursor = conn.execute("DELETE FROM translations WHERE prompt_version != ?", (str(self.prompt_version),))
+            else:
+                cursor = conn.execute("DELETE FROM translations")
+            conn.commit()
+            self._count -= cursor.rowcount
+            return cursor.rowcount
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        hit_rate = (self.hits / lookups * 100) if lookups else 0.0
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": hit_rate}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class ArticleLexicon:
+    """
+    Persistentes Lexikon für `fix_articles.py`: Nomen-Stamm (bzw. ganzer Ausdruck) -> deutscher Artikel.
+    Liegt in derselben SQLite-Datei wie das Übersetzungsgedächtnis, damit jeder Stamm nur einmal aufgelöst wird.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS articles (lookup TEXT PRIMARY KEY, article TEXT NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get_many(self, lookups):
+        """Gibt {Lookup: Artikel} für alle bereits bekannten Einträge zurück."""
+        lookups = list(dict.fromkeys(lookups))
+        found = {}
+        with self._lock:
+            conn = self._connection()
+            for start in range(0, len(lookups), 500):
+                chunk = lookups[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(conn.execute(
+                    f"SELECT lookup, article FROM articles WHERE lookup IN ({placeholders})", chunk
+                ).fetchall())
+            self.hits += len(found)
+            self.misses += len(lookups) - len(found)
+        return found
+
+    def put_many(self, pairs):
+        rows = [(lookup, article) for lookup, article in pairs if article]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.executemany("INSERT OR REPLACE INTO articles VALUES (?, ?)", rows)
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,10 +1,65 @@
 import os
+import sys
+import json
+import hashlib
 from dotenv import load_dotenv
+from translation_journal import atomic_write_lines
+from paradox_yml import LocDocument
 
 load_dotenv()
 
 folder_to_update = os.getenv("FOLDER_PATH")
 
+# Manifest des Sync-Modus: pro englischer Quelldatei Größe, Änderungszeit, Inhalts-Hash
+# sowie Version und Text-Hash jedes Keys zum Zeitpunkt der letzten Synchronisierung.
+# Liegt wie Übersetzungsgedächtnis und Journal außerhalb des Mod-Ordners, damit es nicht mitveröffentlicht
+# wird, und hält die Einträge pro Mod-Ordner (absoluter Pfad).
+SYNC_MANIFEST_FILE = os.getenv("SYNC_MANIFEST_FILE", "translation_sync_manifest.json")
+# Frühere Ablage im Mod-Ordner; wird beim nächsten Abgleich übernommen und danach gelöscht.
+LEGACY_MANIFEST_NAME = ".translation_sync_manifest.json"
+
+def locale_path_for(english_path, language):
+    """Pfad der Sprachdatei (z. B. '_french.yml') zu einer englischen Quelldatei."""
+    directory, filename = os.path.split(english_path)
+    return os.path.join(directory, filename.replace("_english.yml", f"_{language}.yml"))
+
+def german_path_for(english_path):
+    """Pfad der deutschen Datei zu einer englischen Quelldatei."""
+    return locale_path_for(english_path, "german")
+
+def prepare_document(document):
+    """Macht aus einem englischen Dokument im Speicher ein deutsches. Gibt False zurück, wenn es nicht passt."""
+    if document.language != "english":
+        return False
+    document.set_language("german")
+    return True
+
+def derive_locale_document(english_document, english_path, language):
+    """
+    Leitet aus einem bereits geparsten englischen Dokument die Datei einer Zielsprache ab, ohne die Quelle
+    erneut zu lesen. Gibt es die Sprachdatei schon, übernehmen alle dort übersetzten Keys Wert, Kommentar und
+    Marker (wie `--sync` ohne Manifest-Eintrag); der Rest bleibt englisch und wird übersetzt.
+    Gibt (Dokument, Anzahl übernommener Einträge) zurück.
+    """
+    locale_path = locale_path_for(english_path, language)
+    document = english_document.copy(locale_path)
+    document.set_language(language)
+    if not os.path.exists(locale_path):
+        return document, 0
+    with open(locale_path, 'rb') as f:
+        raw = f.read()
+    existing = LocDocument.parse(raw.decode('utf-8'), locale_path).index
+    kept = 0
+    for key, entry in document.index.items():
+        locale_entry = existing.get(key)
+        if locale_entry is not None and locale_entry.translated:
+            document.update_entry(entry, value=locale_entry.value, translated=True, comment=locale_entry.comment)
+            kept += 1
+    # Nur neu schreiben, wenn sich gegenüber der vorhandenen Datei (mit BOM, wie `save()` sie schreibt) etwas ändert.
+    document.bom = True
+    document.modified = document.serialize().encode('utf-8') != raw
+    return document, kept
+
 def update_lotr_yml_files(main_folder):
     """
     Aktualisiert .yml-Dateien, die mit 'lotr_' beginnen, in einem Verzeichnis und dessen Unterverzeichnissen.
@@ -29,27 +84,20 @@ def update_lotr_yml_files(main_folder):
                 old_filepath = os.path.join(root, filename)
                 
                 try:
-                    # Lese die Datei mit 'utf-8-sig', um ein eventuell vorhandenes BOM zu ignorieren
-                    with open(old_filepath, 'r', encoding='utf-8-sig') as f:
-                        lines = f.readlines()
+                    document = LocDocument.load(old_filepath)
                 except Exception as e:
                     print(f"Fehler beim Lesen von {old_filepath}: {e}")
                     continue
 
-                if lines and lines[0].strip() == "l_english:":
-                    lines[0] = "l_german:\n"
-                else:
+                if not prepare_document(document):
                     # Überspringe Dateien, die nicht den Kriterien entsprechen
                     continue
 
-                new_filename = filename.replace("_english.yml", "_german.yml")
-                new_filepath = os.path.join(root, new_filename)
+                new_filepath = german_path_for(old_filepath)
 
                 try:
-                    # === ÄNDERUNG HIER ===
-                    # Schreibe die neue Datei mit 'utf-8-sig', um das BOM am Anfang hinzuzufügen
-                    with open(new_filepath, 'w', encoding='utf-8-sig') as f:
-                        f.writelines(lines)
+                    # Speichert immer mit UTF-8-BOM
+                    document.save(new_filepath)
                 except Exception as e:
                     print(f"Fehler beim Schreiben in {new_filepath}: {e}")
                     continue
@@ -67,8 +115,148 @@ def update_lotr_yml_files(main_folder):
         print("Es wurden keine Dateien gefunden, die den Kriterien entsprachen.")
 
 
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+def read_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def load_manifest(main_folder):
+    manifest = (read_json(SYNC_MANIFEST_FILE) or {}).get(os.path.abspath(main_folder))
+    if manifest is None:
+        manifest = read_json(os.path.join(main_folder, LEGACY_MANIFEST_NAME))
+    return manifest or {}
+
+def save_manifest(main_folder, manifest):
+    manifests = read_json(SYNC_MANIFEST_FILE) or {}
+    manifests[os.path.abspath(main_folder)] = manifest
+    atomic_write_lines(SYNC_MANIFEST_FILE, [json.dumps(manifests, ensure_ascii=False, indent=1)], encoding='utf-8')
+    legacy_path = os.path.join(main_folder, LEGACY_MANIFEST_NAME)
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+
+def sync_english_file(main_folder, english_path, manifest):
+    """
+    Gleicht eine englische Quelldatei im Speicher mit ihrer deutschen Datei ab (siehe `sync_lotr_yml_files`).
+    Gibt None zurück, wenn die Datei nicht lesbar oder keine englische Lokalisierung ist, sonst
+    (deutsches LocDocument, Zähler, neuer Manifest-Eintrag). Ist die Quelle seit dem letzten Abgleich
+    unverändert, ist das Dokument None. Der Manifest-Eintrag sollte erst nach dem Speichern übernommen werden.
+    """
+    german_path = german_path_for(english_path)
+    relative_path = os.path.relpath(english_path, main_folder)
+    previous = manifest.get(relative_path)
+
+    # Schneller Weg: Größe und Änderungszeit unverändert -> Datei nicht einmal lesen.
+    stat = os.stat(english_path)
+    if previous and os.path.exists(german_path) and previous["size"] == stat.st_size and previous["mtime_ns"] == stat.st_mtime_ns:
+        return None, None, previous
+
+    try:
+        with open(english_path, 'rb') as f:
+            raw = f.read()
+        document = LocDocument.parse(raw.decode('utf-8'), english_path)
+    except Exception as e:
+        print(f"Fehler beim Lesen von {english_path}: {e}")
+        return None
+    if document.language != "english":
+        return None
+
+    content_hash = hashlib.sha256(raw).hexdigest()
+    if previous and os.path.exists(german_path) and previous["sha256"] == content_hash:
+        previous.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        return None, None, previous
+
+    german_entries = LocDocument.load(german_path).index if os.path.exists(german_path) else {}
+    english_entries = document.index
+    old_keys = previous["keys"] if previous else None
+    if old_keys is None and german_entries:
+        print(f"  ℹ️ Kein Manifest-Eintrag für '{relative_path}': vorhandene Übersetzungen werden als Ausgangsbasis übernommen.")
+
+    # Die englische Datei wird zur deutschen: unveränderte Keys übernehmen Wert, Kommentar und Marker der alten Übersetzung.
+    source_hashes = {key: [entry.version, text_hash(entry.value)] for key, entry in english_entries.items()}
+    document.set_language("german")
+    document.path = german_path
+    counts = {"kept": 0, "invalidated": 0, "added": 0, "removed": 0}
+    for key, entry in english_entries.items():
+        german_entry = german_entries.get(key)
+        if german_entry is None:
+            counts["added"] += 1
+            continue
+        unchanged = old_keys is None or old_keys.get(key) == source_hashes[key]
+        if unchanged:
+            document.update_entry(entry, value=german_entry.value, translated=german_entry.translated, comment=german_entry.comment)
+            counts["kept"] += 1
+        else:
+            counts["invalidated"] += 1
+    counts["removed"] = len(set(german_entries) - set(english_entries))
+    print(f"  🔄 {relative_path}: {counts['kept']} übernommen, {counts['invalidated']} geändert, {counts['added']} neu, {counts['removed']} entfernt.")
+
+    manifest_entry = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": content_hash,
+        "keys": source_hashes,
+    }
+    return document, counts, manifest_entry
+
+def sync_lotr_yml_files(main_folder):
+    """
+    Inkrementeller Abgleich nach einem Mod-Update: Die englischen Quellen bleiben erhalten und werden
+    Key für Key mit dem Stand der letzten Synchronisierung (aus dem Manifest) verglichen.
+    - Unveränderte Keys (gleiche Version, gleicher Text) behalten ihre deutsche Zeile.
+    - Geänderte und neue Keys erhalten die englische Zeile und werden beim nächsten Lauf übersetzt.
+    - Entfernte Keys verschwinden aus der deutschen Datei.
+    Dateien mit unveränderter Größe und Änderungszeit werden gar nicht erst gelesen.
+
+    Args:
+        main_folder (str): Der Pfad zum Hauptordner.
+    """
+    print(f"--- Starte inkrementellen Abgleich in: '{main_folder}' ---")
+
+    if not os.path.isdir(main_folder):
+        print(f"🛑 FEHLER: Der angegebene Ordner '{main_folder}' existiert nicht.")
+        return
+
+    manifest = load_manifest(main_folder)
+    totals = {"skipped": 0, "synced": 0, "kept": 0, "invalidated": 0, "added": 0, "removed": 0}
+    for root, _, files in os.walk(main_folder):
+        for filename in files:
+            if not filename.endswith("_english.yml"):
+                continue
+            english_path = os.path.join(root, filename)
+            result = sync_english_file(main_folder, english_path, manifest)
+            if result is None:
+                continue
+            document, counts, manifest_entry = result
+            if document is None:
+                totals["skipped"] += 1
+                continue
+
+            german_path = german_path_for(english_path)
+            try:
+                document.save(german_path)
+            except Exception as e:
+                print(f"Fehler beim Schreiben in {german_path}: {e}")
+                continue
+
+            manifest[os.path.relpath(english_path, main_folder)] = manifest_entry
+            totals["synced"] += 1
+            for name, count in counts.items():
+                totals[name] += count
+
+    save_manifest(main_folder, manifest)
+    print("\n--- Abgleich abgeschlossen ---")
+    print(f"✨ {totals['synced']} Dateien abgeglichen, {totals['skipped']} unverändert übersprungen.")
+    print(f"   {totals['kept']} Übersetzungen übernommen, {totals['invalidated'] + totals['added']} Keys müssen (neu) übersetzt werden, {totals['removed']} entfernt.")
+
+
 if __name__ == '__main__':
     if not folder_to_update or not os.path.isdir(folder_to_update):
-         print("🛑 FEHLER: FOLDER_PATH in der .env-Datei ist nicht gesetzt oder kein gültiger Ordner.")
+        print("🛑 FEHLER: FOLDER_PATH in der .env-Datei ist nicht gesetzt oder kein gültiger Ordner.")
+    elif "--sync" in sys.argv[1:]:
+        sync_lotr_yml_files(folder_to_update)
     else:
-        translate_lotr_files(folder_to_update)
\ No newline at end of file
+        update_lotr_yml_files(folder_to_update)
\ No newline at end of file